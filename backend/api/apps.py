@@ -5,3 +5,6 @@ class ApiConfig(AppConfig):
     verbose_name = 'Api logic'
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        import api.signals  # noqa: F401
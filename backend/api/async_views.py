@@ -0,0 +1,143 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.catalogue_cache import TAGS_VERSION_KEY, acached_catalogue
+from api.filters import IngredientFilter
+from api.ingredient_index import INGREDIENTS_VERSION_KEY, ingredient_index
+from api.metrics import acount_export_bytes
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeSafeMethodSerializer
+from api.shopping_list import (
+    SHOPPING_LIST_FORMATS, TEXT_FORMATS, get_ingredient_totals, get_pdf,
+    iter_bytes
+)
+from recipes.models import Recipe, ShoppingCart
+
+
+def async_read_view(handler, fallback):
+    """Serve GET with the async ``handler`` and the rest with DRF.
+
+    The handler returns None for whatever it does not cover (errors,
+    unusual credentials, missing objects) and the request is passed to
+    the sync ``fallback`` view, so both paths answer the same way.
+    """
+    sync_fallback = sync_to_async(fallback)
+
+    @wraps(handler)
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET':
+            response = await handler(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_fallback(request, *args, **kwargs)
+
+    view.cls = fallback.cls
+    view.actions = fallback.actions
+    view.csrf_exempt = True
+    return view
+
+
+async def get_user(request):
+    """Resolve the token user, or None to leave the request to DRF."""
+    auth = request.headers.get('Authorization', '').split()
+    if not auth:
+        return AnonymousUser()
+    if len(auth) != 2 or (
+        auth[0].lower() != TokenAuthentication.keyword.lower()
+    ):
+        return None
+    token = await Token.objects.select_related('user').filter(
+        key=auth[1]
+    ).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+def json_response(data):
+    return HttpResponse(
+        FastJSONRenderer().render(data), content_type='application/json'
+    )
+
+
+async def aiter_chunks(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def aiter_lines(export_format, ingredients):
+    """Format rows as they arrive, so the export never sits in memory."""
+    header, line = TEXT_FORMATS[export_format]
+    if header:
+        yield header
+    number = 0
+    async for ingredient in ingredients:
+        number += 1
+        yield line(number, ingredient)
+
+
+async def tag_list(request):
+    return await acached_catalogue(request, TAGS_VERSION_KEY)
+
+
+async def ingredient_list(request):
+    name = request.GET.get(IngredientFilter.search_param)
+    if name is None:
+        return None
+    ranked = request.GET.get('ranked') in ('1', 'true')
+
+    async def render():
+        return FastJSONRenderer().render(
+            await sync_to_async(ingredient_index.search)(name, ranked=ranked)
+        )
+
+    return await acached_catalogue(request, INGREDIENTS_VERSION_KEY, render)
+
+
+async def recipe_detail(request, pk):
+    user = await get_user(request)
+    if user is None:
+        return None
+    request.user = user
+    recipe = await Recipe.objects.for_read(user).filter(pk=pk).afirst()
+    if recipe is None:
+        return None
+    return json_response(
+        RecipeSafeMethodSerializer(recipe, context={'request': request}).data
+    )
+
+
+async def download_shopping_cart(request):
+    user = await get_user(request)
+    export_format = request.GET.get('format', 'txt')
+    if (
+        user is None
+        or user.is_anonymous
+        or export_format not in SHOPPING_LIST_FORMATS
+        or not await ShoppingCart.objects.filter(user=user).aexists()
+    ):
+        return None
+    content_type, extension = SHOPPING_LIST_FORMATS[export_format]
+    if export_format == 'pdf':
+        content = aiter_chunks(iter_bytes(await sync_to_async(get_pdf)(user)))
+    else:
+        content = aiter_lines(
+            export_format,
+            get_ingredient_totals(user).aiterator(
+                chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
+            )
+        )
+    response = StreamingHttpResponse(
+        acount_export_bytes(content, export_format),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename=your_shopping_list{extension}'
+    )
+    return response
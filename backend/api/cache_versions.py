@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from api.models import CacheVersion
+
+LOCAL_KEY = 'cache_version:{key}'
+
+
+def get_version(key):
+    """Version of a cached derivative, shared by all processes.
+
+    Versions live in the database, so a bump made by another worker or a
+    management command is seen here at most CACHE_VERSION_TTL seconds
+    later, even when the default cache is process-local.
+    """
+    local_key = LOCAL_KEY.format(key=key)
+    version = cache.get(local_key)
+    if version is None:
+        version = CacheVersion.objects.filter(key=key).values_list(
+            'version', flat=True
+        ).first() or 1
+        cache.set(local_key, version, settings.CACHE_VERSION_TTL)
+    return version
+
+
+def bump_version(key):
+    if not CacheVersion.objects.filter(key=key).update(
+        version=F('version') + 1
+    ):
+        CacheVersion.objects.get_or_create(key=key, defaults={'version': 2})
+    cache.delete(LOCAL_KEY.format(key=key))
+
+
+def bump_versions(keys):
+    """bump_version() for several keys, usually in one query."""
+    keys = set(keys)
+    if not keys:
+        return
+    if CacheVersion.objects.filter(key__in=keys).update(
+        version=F('version') + 1
+    ) < len(keys):
+        CacheVersion.objects.bulk_create(
+            [CacheVersion(key=key, version=2) for key in keys],
+            ignore_conflicts=True
+        )
+    cache.delete_many([LOCAL_KEY.format(key=key) for key in keys])
+
+
+async def aget_version(key):
+    local_key = LOCAL_KEY.format(key=key)
+    version = await cache.aget(local_key)
+    if version is None:
+        version = await CacheVersion.objects.filter(key=key).values_list(
+            'version', flat=True
+        ).afirst() or 1
+        await cache.aset(local_key, version, settings.CACHE_VERSION_TTL)
+    return version
@@ -0,0 +1,111 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework import status
+
+from api.cache_versions import aget_version, bump_version, get_version
+from api.metrics import count_cache_lookup
+from api.renderers import FastJSONRenderer
+
+TAGS_VERSION_KEY = 'tags_version'
+CATALOGUE_KEY = 'catalogue:{etag}'
+
+
+def invalidate_tags():
+    bump_version(TAGS_VERSION_KEY)
+
+
+def catalogue_etag(version_key, version, path):
+    digest = hashlib.md5(f'{version_key}:{version}:{path}'.encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def not_modified(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match or (
+        etag not in parse_etags(if_none_match) and if_none_match != '*'
+    ):
+        return None
+    count_cache_lookup('catalogue', 'not_modified')
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def catalogue_response(content, etag):
+    response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+async def acached_catalogue(request, version_key, render=None):
+    """Async counterpart of CatalogueCacheMixin.cached_response.
+
+    Answers If-None-Match and cache hits without leaving the event loop.
+    On a miss the body comes from the ``render`` coroutine; without one
+    None is returned and the caller falls back to the sync view.
+    """
+    etag = catalogue_etag(
+        version_key, await aget_version(version_key),
+        request.get_full_path()
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    key = CATALOGUE_KEY.format(etag=etag.strip('"'))
+    content = await cache.aget(key)
+    result = 'hit'
+    if content is None:
+        if render is None:
+            return None
+        result = 'miss'
+        content = await render()
+        await cache.aset(key, content, settings.CATALOGUE_CACHE_TIMEOUT)
+    count_cache_lookup('catalogue', result)
+    return catalogue_response(content, etag)
+
+
+class CatalogueCacheMixin:
+    """Serve rarely changing read-only catalogues from a versioned cache.
+
+    The ETag is derived from the catalogue version and the request path,
+    so a matching If-None-Match is answered before the database, the
+    cache body or the serializer are touched.
+    """
+
+    catalogue_version_key = None
+    authentication_classes = ()
+
+    def get_etag(self, request):
+        return catalogue_etag(
+            self.catalogue_version_key,
+            get_version(self.catalogue_version_key),
+            request.get_full_path()
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        key = CATALOGUE_KEY.format(etag=etag.strip('"'))
+        content = cache.get(key)
+        count_cache_lookup('catalogue', 'miss' if content is None else 'hit')
+        if content is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            content = FastJSONRenderer().render(response.data)
+            cache.set(key, content, settings.CATALOGUE_CACHE_TIMEOUT)
+        return catalogue_response(content, etag)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,40 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+read_from_replica = ContextVar('read_from_replica', default=False)
+# Credentials are created by anonymous requests, which are never pinned
+# to the primary, and a lagging replica would answer the first request
+# that uses them with 401.
+PRIMARY_READ_MODELS = {'authtoken.token', 'sessions.session'}
+
+
+class ReplicaRouter:
+    """Send reads to a replica while the current request allows it.
+
+    ReplicaRoutingMiddleware enables replica reads for safe requests of
+    clients that have not written recently. Reads inside an atomic block
+    on the primary, such as the RecipeSerializer writes, stay on it, and
+    so do token and session lookups.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICAS
+            and read_from_replica.get()
+            and not connections['default'].in_atomic_block
+            and model._meta.label_lower not in PRIMARY_READ_MODELS
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,108 @@
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.files.storage import default_storage
+from rest_framework.response import Response
+
+from api.serializers import (
+    CustomDjoserUserSerializer, RecipeSafeMethodSerializer, TagSerializer
+)
+from recipes.models import IngredientRecipe, Tag, annotate_is_subscribed
+from users.models import User
+
+RECIPE_NESTED_FIELDS = ('tags', 'author', 'ingredients')
+
+
+@lru_cache(maxsize=None)
+def field_names(serializer_class):
+    return tuple(
+        name for name, field in serializer_class().fields.items()
+        if not field.write_only
+    )
+
+
+class ValuesListMixin:
+    """list() built from queryset.values() instead of the serializer.
+
+    Only for serializers whose fields are plain model columns.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *field_names(self.get_serializer_class())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(queryset))
+
+
+def recipe_values(queryset):
+    """Recipe rows with every column recipe_rows() reads.
+
+    pub_date is kept for cursor pagination and image_variants for the
+    image URL; neither is in the output.
+    """
+    return queryset.prefetch_related(None).values(
+        *(
+            field for field in field_names(RecipeSafeMethodSerializer)
+            if field not in RECIPE_NESTED_FIELDS
+        ),
+        'author_id', 'image_variants', 'pub_date'
+    )
+
+
+def image_url(request, image, variants, variant):
+    if not image:
+        return None
+    url = default_storage.url(variant and variants.get(variant) or image)
+    if request is None:
+        return url
+    return request.build_absolute_uri(url)
+
+
+def recipe_rows(rows, request, image_variant=None):
+    """Same dicts as RecipeSafeMethodSerializer for recipe_values() rows.
+
+    Tags, ingredients and authors are read with one values() query each
+    and joined in Python, so no model instance is created.
+    """
+    recipe_ids = [row['id'] for row in rows]
+    tags = defaultdict(list)
+    for tag in Tag.objects.filter(recipe__in=recipe_ids).values(
+        'recipe', *field_names(TagSerializer)
+    ):
+        tags[tag.pop('recipe')].append(tag)
+    ingredients = defaultdict(list)
+    for recipe_id, *ingredient in IngredientRecipe.objects.filter(
+        recipe__in=recipe_ids
+    ).values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    ):
+        ingredients[recipe_id].append(dict(zip(
+            ('id', 'name', 'measurement_unit', 'amount'), ingredient
+        )))
+    authors = {
+        author['id']: author
+        for author in annotate_is_subscribed(
+            User.objects.filter(pk__in={row['author_id'] for row in rows}),
+            request.user
+        ).values(*field_names(CustomDjoserUserSerializer))
+    }
+    fields = field_names(RecipeSafeMethodSerializer)
+    result = []
+    for row in rows:
+        related = {
+            'tags': tags[row['id']],
+            'author': authors[row['author_id']],
+            'ingredients': ingredients[row['id']],
+            'image': image_url(
+                request, row['image'], row['image_variants'], image_variant
+            ),
+        }
+        result.append({
+            field: related[field] if field in related else row[field]
+            for field in fields
+        })
+    return result
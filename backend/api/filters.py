@@ -1,7 +1,8 @@
 from django_filters import rest_framework
 from rest_framework import filters
 
-from recipes.models import Recipe, Tag
+from api.recipe_search import search_recipes
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag, TagRecipe
 
 
 class IngredientFilter(filters.SearchFilter):
@@ -10,25 +11,42 @@ class IngredientFilter(filters.SearchFilter):
 
 class RecipeFilter(rest_framework.FilterSet):
     tags = rest_framework.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
+        method='filter_tags',
     )
     is_favorited = rest_framework.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = rest_framework.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = rest_framework.CharFilter(method='filter_search')
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(pk__in=TagRecipe.objects.filter(
+            tag__in=value
+        ).values('recipe_id'))
 
     def filter_is_favorited(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(in_favorites__user_id=self.request.user.id)
+            return queryset.filter(pk__in=Favorite.objects.filter(
+                user=self.request.user
+            ).values('recipe_id'))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(in_shopping_list__user=self.request.user)
+            return queryset.filter(pk__in=ShoppingCart.objects.filter(
+                user=self.request.user
+            ).values('recipe_id'))
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags')
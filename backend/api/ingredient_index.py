@@ -0,0 +1,62 @@
+import threading
+from bisect import bisect_left
+
+from api.cache_versions import bump_version, get_version
+from recipes.models import Ingredient
+
+INGREDIENTS_VERSION_KEY = 'ingredients_version'
+LAST_CHAR = '\U0010ffff'
+
+
+def fold(value):
+    return value.casefold().replace('ё', 'е').strip()
+
+
+class IngredientIndex:
+    """Process-local sorted index of ingredient names for autocomplete."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = ((), ())
+
+    def _build(self, version):
+        entries = sorted(
+            (fold(row['name']), row['id'], row)
+            for row in Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        self._entries = (
+            tuple(entry[0] for entry in entries),
+            tuple(entry[2] for entry in entries),
+        )
+        self._version = version
+
+    def _ensure_fresh(self):
+        version = get_version(INGREDIENTS_VERSION_KEY)
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._build(version)
+        return self._entries
+
+    def search(self, query, ranked=False):
+        names, rows = self._ensure_fresh()
+        query = fold(query)
+        start = bisect_left(names, query)
+        end = bisect_left(names, query + LAST_CHAR, lo=start)
+        result = list(rows[start:end])
+        if ranked and query:
+            result.extend(
+                row for name, row in zip(names, rows)
+                if query in name and not name.startswith(query)
+            )
+        return result
+
+
+ingredient_index = IngredientIndex()
+
+
+def invalidate_ingredient_index():
+    bump_version(INGREDIENTS_VERSION_KEY)
@@ -0,0 +1,126 @@
+import json
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Tag
+from users.models import User
+
+ENDPOINTS = (
+    ('recipes-list', '/api/recipes/'),
+    ('recipes-list-tags', '/api/recipes/?tags={tag}'),
+    ('users-subscriptions', '/api/users/subscriptions/?recipes_limit=3'),
+    ('ingredients-search', '/api/ingredients/?name={ingredient}'),
+    ('recipes-download-shopping-cart',
+     '/api/recipes/download_shopping_cart/'),
+)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, round(fraction * (len(values) - 1)))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and query counts of the main API endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--baseline', default='benchmark_baseline.json',
+            help='JSON file to compare against'
+        )
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Overwrite the baseline with this run'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=1.2,
+            help='Slowdown ratio reported as a regression'
+        )
+        parser.add_argument('--endpoint', action='append', default=None)
+
+    def handle(self, *args, **options):
+        user = User.objects.annotate(
+            cart=Count('shopping_list', distinct=True),
+            subscriptions=Count('follower', distinct=True),
+        ).order_by('-cart', '-subscriptions').first()
+        if user is None:
+            raise CommandError('Database is empty, run generate_data first')
+        tag = Tag.objects.values_list('slug', flat=True).first() or ''
+        ingredient = (
+            Ingredient.objects.values_list('name', flat=True).first() or ''
+        )[:3]
+        client = APIClient()
+        client.force_authenticate(user)
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for name, url in ENDPOINTS:
+                if options['endpoint'] and name not in options['endpoint']:
+                    continue
+                results[name] = self.measure(
+                    client, url.format(tag=tag, ingredient=ingredient),
+                    options['iterations'], options['warmup']
+                )
+        baseline = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        self.report(results, baseline, options['threshold'])
+        if options['save']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Baseline saved to {options["baseline"]}')
+
+    def measure(self, client, url, iterations, warmup):
+        timings = []
+        queries = []
+        for i in range(warmup + iterations):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+            if i >= warmup:
+                timings.append(elapsed)
+                queries.append(len(context))
+        return {
+            'url': url,
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p90_ms': round(percentile(timings, 0.9), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': max(queries),
+        }
+
+    def report(self, results, baseline, threshold):
+        self.stdout.write(
+            f'{"endpoint":34}{"p50":>9}{"p90":>9}{"p99":>9}{"queries":>9}'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:34}{result["p50_ms"]:9.2f}{result["p90_ms"]:9.2f}'
+                f'{result["p99_ms"]:9.2f}{result["queries"]:9}'
+            )
+            previous = baseline.get(name)
+            if previous is None:
+                self.stdout.write(line)
+                continue
+            ratio = result['p50_ms'] / previous['p50_ms']
+            line += f'  x{ratio:.2f} p50, {previous["queries"]} queries before'
+            if (ratio > threshold
+                    or result['queries'] > previous['queries']):
+                self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
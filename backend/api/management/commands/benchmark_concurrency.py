@@ -0,0 +1,175 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Ingredient, Recipe, ShoppingCart
+
+
+class LoadResult:
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by server')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.read()
+        headers['connection'] = 'close'
+    return status, headers.get('connection') == 'close'
+
+
+async def client(base_url, paths, headers, deadline, result):
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    requests = [
+        (
+            f'GET {url.path.rstrip("/")}{path} HTTP/1.1\r\n'
+            f'Host: {url.netloc}\r\n{headers}\r\n'
+        ).encode()
+        for path in paths
+    ]
+    reader = writer = None
+    sent = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(requests[sent % len(requests)])
+            sent += 1
+            status, close = await read_response(reader)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError):
+            result.errors += 1
+            close = True
+        else:
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+        if close and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(base_url, paths, headers, concurrency, duration):
+    result = LoadResult()
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        client(base_url, paths, headers, deadline, result)
+        for _ in range(concurrency)
+    ))
+    return result
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure throughput of the hot read endpoints of running '
+        'deployments under many concurrent keep-alive connections, e.g. '
+        'wsgi=http://127.0.0.1:8001 served by "gunicorn foodgram.wsgi" '
+        'and asgi=http://127.0.0.1:8002 served by "gunicorn '
+        'foodgram.asgi:application -k uvicorn.workers.UvicornWorker"'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets', nargs='+', metavar='NAME=URL',
+            help='Deployments to compare, URL up to and including /api'
+        )
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument(
+            '--token',
+            help='Send requests as this user; adds the shopping list '
+                 'download when their cart is not empty'
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path relative to the target URL, may be repeated'
+        )
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['targets']:
+            name, _, url = target.partition('=')
+            if not url.startswith('http://'):
+                raise CommandError(f'Expected NAME=http://..., got {target}')
+            targets.append((name, url))
+        paths = options['paths'] or self.default_paths(options['token'])
+        headers = 'Connection: keep-alive\r\n'
+        if options['token']:
+            headers += f'Authorization: Token {options["token"]}\r\n'
+        self.stdout.write(
+            f'{options["concurrency"]} connections, '
+            f'{options["duration"]:g}s per target, paths: {", ".join(paths)}'
+        )
+        self.stdout.write(
+            f'{"target":10}{"requests":>10}{"errors":>8}{"non-2xx":>9}'
+            f'{"req/s":>10}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+        )
+        for name, url in targets:
+            result = asyncio.run(run_load(
+                url, paths, headers,
+                options['concurrency'], options['duration']
+            ))
+            self.report(name, result, options['duration'])
+
+    def default_paths(self, token):
+        ingredient = Ingredient.objects.order_by('pk').first()
+        recipe = Recipe.objects.order_by('-pk').first()
+        if ingredient is None or recipe is None:
+            raise CommandError('Database is empty, run generate_data first')
+        paths = [
+            '/tags/',
+            f'/ingredients/?name={quote(ingredient.name[:2])}',
+            f'/recipes/{recipe.pk}/',
+        ]
+        if token and ShoppingCart.objects.filter(
+            user__auth_token__key=token
+        ).exists():
+            paths.append('/recipes/download_shopping_cart/')
+        return paths
+
+    def report(self, name, result, duration):
+        latencies = sorted(result.latencies)
+        if not latencies:
+            self.stdout.write(f'{name:10}no successful requests')
+            return
+        failed = sum(
+            count for status, count in result.statuses.items()
+            if not 200 <= status < 300
+        )
+        self.stdout.write(
+            f'{name:10}{len(latencies):10}{result.errors:8}{failed:9}'
+            f'{len(latencies) / duration:10.1f}'
+            f'{statistics.median(latencies) * 1000:9.1f}'
+            f'{percentile(latencies, 0.95) * 1000:9.1f}'
+            f'{percentile(latencies, 0.99) * 1000:9.1f}'
+        )
@@ -0,0 +1,87 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+def join_queryset(params, user):
+    queryset = Recipe.objects.all()
+    if 'tags' in params:
+        queryset = queryset.filter(tags__slug__in=params['tags']).distinct()
+    if 'is_favorited' in params:
+        queryset = queryset.filter(in_favorites__user=user)
+    if 'is_in_shopping_cart' in params:
+        queryset = queryset.filter(in_shopping_list__user=user)
+    if 'author' in params:
+        queryset = queryset.filter(author=params['author'])
+    return queryset
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare plans and timings of the join-based and semi-join '
+        'recipe filters'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Print the query plans of both variants'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.annotate(
+            favorites_total=Count('favorites', distinct=True),
+        ).order_by('-favorites_total').first()
+        author = User.objects.order_by('-counters__recipes_count').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:3])
+        if user is None or not tags:
+            raise CommandError('Database is empty, run generate_data first')
+        cases = {
+            'tags': {'tags': tags},
+            'favorited': {'is_favorited': 'true'},
+            'in-cart': {'is_in_shopping_cart': 'true'},
+            'author': {'author': author.pk},
+            'favorited-tags': {'is_favorited': 'true', 'tags': tags},
+        }
+        request = RequestFactory().get('/api/recipes/')
+        request.user = user
+        self.stdout.write(
+            f'{Recipe.objects.count()} recipes, user {user.pk}, '
+            f'tags {", ".join(tags)}'
+        )
+        self.stdout.write(
+            f'{"case":18}{"join ms":>10}{"semi ms":>10}{"speedup":>9}'
+        )
+        for name, params in cases.items():
+            semi_join = RecipeFilter(
+                params, queryset=Recipe.objects.all(), request=request
+            ).qs
+            join = join_queryset(params, user)
+            join_ms = self.measure(join, options['iterations'])
+            semi_join_ms = self.measure(semi_join, options['iterations'])
+            self.stdout.write(
+                f'{name:18}{join_ms:10.2f}{semi_join_ms:10.2f}'
+                f'{join_ms / semi_join_ms:8.2f}x'
+            )
+            if options['explain']:
+                self.stdout.write(f'-- join\n{join.explain()}')
+                self.stdout.write(f'-- semi-join\n{semi_join.explain()}')
+
+    def measure(self, queryset, iterations):
+        page_size = settings.RECIPE_PAG_PAGE_SIZE
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            queryset.count()
+            list(queryset[:page_size])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
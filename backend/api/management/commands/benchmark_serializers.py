@@ -0,0 +1,116 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_read import field_names, recipe_rows, recipe_values
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import (
+    IngredientSerializer, RecipeSafeMethodSerializer, TagSerializer
+)
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-item cost of the serializer read path with the '
+        'values() read path and of JSONRenderer with FastJSONRenderer'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help='Items serialized per iteration'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.annotate(
+            subscriptions_total=Count('follower'),
+        ).order_by('-subscriptions_total').first()
+        if user is None or not Recipe.objects.exists():
+            raise CommandError('Database is empty, run generate_data first')
+        request = RequestFactory().get(
+            '/api/recipes/', HTTP_HOST=settings.ALLOWED_HOSTS[0]
+        )
+        request.user = user
+        limit = options['limit']
+        variant = settings.RECIPE_IMAGE_LIST_VARIANT
+        recipes = Recipe.objects.for_read(user)
+        cases = {
+            'recipes': (
+                lambda: RecipeSafeMethodSerializer(
+                    recipes[:limit], many=True, context={
+                        'request': request, 'image_variant': variant
+                    }
+                ).data,
+                lambda: recipe_rows(
+                    list(recipe_values(recipes)[:limit]), request, variant
+                ),
+            ),
+            'ingredients': (
+                lambda: IngredientSerializer(
+                    Ingredient.objects.all()[:limit], many=True
+                ).data,
+                lambda: list(Ingredient.objects.values(
+                    *field_names(IngredientSerializer)
+                )[:limit]),
+            ),
+            'tags': (
+                lambda: TagSerializer(
+                    Tag.objects.all()[:limit], many=True
+                ).data,
+                lambda: list(Tag.objects.values(
+                    *field_names(TagSerializer)
+                )[:limit]),
+            ),
+        }
+        self.stdout.write(
+            f'user {user.pk}, up to {limit} items, orjson '
+            f'{"installed" if orjson else "not installed"}'
+        )
+        self.stdout.write(
+            f'{"case":12}{"items":>6}{"stage":>8}'
+            f'{"drf us":>10}{"fast us":>10}{"speedup":>9}'
+        )
+        for name, (serialize, fast_serialize) in cases.items():
+            data, slow = self.measure(serialize, options['iterations'])
+            fast_data, fast = self.measure(
+                fast_serialize, options['iterations']
+            )
+            content, render = self.measure(
+                lambda: JSONRenderer().render(data), options['iterations']
+            )
+            fast_content, fast_render = self.measure(
+                lambda: FastJSONRenderer().render(fast_data),
+                options['iterations']
+            )
+            if content != fast_content:
+                raise CommandError(f'{name}: fast read path output differs')
+            items = len(data) or 1
+            self.report(name, len(data), 'build', slow, fast, items)
+            self.report(name, '', 'render', render, fast_render, items)
+            self.report(
+                name, '', 'total', slow + render,
+                fast + fast_render, items
+            )
+
+    def measure(self, func, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        return result, statistics.median(timings)
+
+    def report(self, name, count, stage, slow, fast, items):
+        self.stdout.write(
+            f'{name:12}{count:>6}{stage:>8}'
+            f'{slow / items * 1e6:10.1f}{fast / items * 1e6:10.1f}'
+            f'{slow / fast:8.2f}x'
+        )
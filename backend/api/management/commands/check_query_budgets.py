@@ -0,0 +1,142 @@
+import io
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test.runner import DiscoverRunner
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment,
+    teardown_test_environment
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Subscribe, User
+
+BUDGET_URLS = {
+    'TagViewSet.list': '/api/tags/',
+    'TagViewSet.retrieve': '/api/tags/{tag}/',
+    'IngredientViewSet.list': '/api/ingredients/?name=ингр',
+    'IngredientViewSet.retrieve': '/api/ingredients/{ingredient}/',
+    'RecipeViewSet.list': '/api/recipes/?limit={size}',
+    'RecipeViewSet.retrieve': '/api/recipes/{recipe}/',
+    'RecipeViewSet.download_shopping_cart':
+        '/api/recipes/download_shopping_cart/',
+    'RecipeViewSet.shopping_list': '/api/recipes/shopping_list/',
+    'RecipeViewSet.what_to_cook':
+        '/api/recipes/what_to_cook/?{ingredients}&limit={size}',
+    'RecipeViewSet.feed': '/api/recipes/feed/?limit={size}',
+    'CustomDjoserUserViewSet.list': '/api/users/?limit={size}',
+    'CustomDjoserUserViewSet.subscriptions':
+        '/api/users/subscriptions/?limit={size}&recipes_limit=3',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that every endpoint in QUERY_BUDGETS stays within its query '
+        'budget and that the query count does not grow with page size'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=(2, 10, 30),
+            help='Data and page sizes to check'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                counts = self.collect(options['sizes'])
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+        self.check_counts(counts, options['sizes'])
+
+    def collect(self, sizes):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(50)
+        )
+        counts = {key: [] for key in settings.QUERY_BUDGETS}
+        for size in sizes:
+            call_command(
+                'generate_data', users=size, recipes=size * 3, tags=3,
+                favorites=size, cart=size, subscriptions=size, seed=size,
+                stdout=io.StringIO(),
+            )
+            user = User.objects.first()
+            self.fill_relations(user, size)
+            client = APIClient()
+            client.credentials(
+                HTTP_AUTHORIZATION=(
+                    f'Token {Token.objects.get_or_create(user=user)[0].key}'
+                )
+            )
+            context = {
+                'size': size,
+                'tag': Tag.objects.values_list('id', flat=True).first(),
+                'ingredient': Ingredient.objects.values_list(
+                    'id', flat=True
+                ).first(),
+                'recipe': Recipe.objects.values_list('id', flat=True).first(),
+                'ingredients': '&'.join(
+                    f'ingredients={pk}' for pk in Ingredient.objects.filter(
+                        recipe__isnull=False
+                    ).values_list('id', flat=True).distinct()[:size]
+                ),
+            }
+            for key in counts:
+                url = BUDGET_URLS[key].format(**context)
+                self.count_queries(client, url)
+                counts[key].append(self.count_queries(client, url))
+        return counts
+
+    def fill_relations(self, user, size):
+        authors = User.objects.exclude(pk=user.pk).annotate(
+            recipes=Count('recipe')
+        ).filter(recipes__gt=0)[:size]
+        Subscribe.objects.bulk_create(
+            (Subscribe(subscriber=user, author=author) for author in authors),
+            ignore_conflicts=True
+        )
+        ShoppingCart.objects.bulk_create(
+            (
+                ShoppingCart(user=user, recipe=recipe)
+                for recipe in Recipe.objects.all()[:size]
+            ),
+            ignore_conflicts=True
+        )
+        call_command('reconcile_counters', stdout=io.StringIO())
+        call_command('rebuild_feeds', stdout=io.StringIO())
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}')
+        return len(queries)
+
+    def check_counts(self, counts, sizes):
+        failures = []
+        for key, values in counts.items():
+            budget = settings.QUERY_BUDGETS[key]
+            line = f'{key:45} budget {budget:3}  queries {values}'
+            if max(values) > budget:
+                failures.append(f'{key}: over budget')
+                self.stdout.write(self.style.ERROR(line))
+            elif len(set(values)) > 1:
+                failures.append(f'{key}: grows with page size {sizes}')
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+        if failures:
+            raise CommandError('\n'.join(failures))
@@ -0,0 +1,92 @@
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess
+)
+
+REQUESTS = Counter(
+    'foodgram_requests_total', 'HTTP requests by view and status',
+    ('view', 'method', 'status')
+)
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds', 'Request latency by view',
+    ('view', 'method'), buckets=settings.METRICS_LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_queries', 'SQL queries per request by view',
+    ('view', 'method'), buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+CACHE_LOOKUPS = Counter(
+    'foodgram_cache_lookups_total', 'Application cache lookups by result',
+    ('cache', 'result')
+)
+SHOPPING_LIST_EXPORT_BYTES = Histogram(
+    'foodgram_shopping_list_export_bytes', 'Shopping list download size',
+    ('format',), buckets=(
+        256, 1024, 4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024
+    )
+)
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name or 'unnamed'
+
+
+def observe_request(request, response, duration, queries):
+    view = get_view_name(request)
+    REQUESTS.labels(view, request.method, response.status_code).inc()
+    REQUEST_LATENCY.labels(view, request.method).observe(duration)
+    REQUEST_QUERIES.labels(view, request.method).observe(queries)
+
+
+def count_cache_lookup(cache_name, result):
+    CACHE_LOOKUPS.labels(cache_name, result).inc()
+
+
+def chunk_size(chunk):
+    return len(chunk.encode() if isinstance(chunk, str) else chunk)
+
+
+def count_export_bytes(chunks, export_format):
+    size = 0
+    for chunk in chunks:
+        size += chunk_size(chunk)
+        yield chunk
+    SHOPPING_LIST_EXPORT_BYTES.labels(export_format).observe(size)
+
+
+async def acount_export_bytes(chunks, export_format):
+    size = 0
+    async for chunk in chunks:
+        size += chunk_size(chunk)
+        yield chunk
+    SHOPPING_LIST_EXPORT_BYTES.labels(export_format).observe(size)
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Prometheus metrics; not served unless METRICS_TOKEN is set."""
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    if not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
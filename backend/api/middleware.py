@@ -0,0 +1,281 @@
+import cProfile
+import hashlib
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from types import MethodType
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from api.db_router import read_from_replica
+from api.metrics import observe_request
+
+logger = logging.getLogger('api.query_budget')
+timing_logger = logging.getLogger('api.timing')
+
+
+def get_view_key(view_func, method):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return None
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+
+active_counters = ContextVar('active_counters', default=())
+
+
+def record_queries(execute, sql, params, many, context):
+    """Execute wrapper feeding the query counters of the current request.
+
+    Counters travel in a context variable rather than being attached to
+    the connections, because async views run their queries on
+    connections of the sync_to_async worker thread.
+    """
+    counters = active_counters.get()
+    if not counters:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for counter in counters:
+            counter.count += 1
+            counter.duration += duration
+
+
+def install_query_recorder(connection):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+def count_queries(stack):
+    counter = QueryCounter()
+    for connection in connections.all():
+        install_query_recorder(connection)
+    token = active_counters.set((*active_counters.get(), counter))
+    stack.callback(active_counters.reset, token)
+    return counter
+
+
+def inline_hook(hook):
+    async def ahook(self, *args):
+        return hook(*args)
+
+    return MethodType(ahook, hook.__self__)
+
+
+class AsyncCapableMiddleware:
+    """Middleware that wraps both sync and async views without thread hops.
+
+    Subclasses implement around(), a generator that yields once to get
+    the response from the rest of the chain and returns the final one.
+    Their process_view() and process_template_response() hooks must not
+    block: under ASGI they are turned into coroutines run on the event
+    loop, as Django would otherwise call them through sync_to_async.
+    """
+
+    sync_capable = True
+    async_capable = True
+    hooks = ('process_view', 'process_template_response')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            for name in self.hooks:
+                hook = getattr(self, name, None)
+                if hook is not None:
+                    setattr(self, name, inline_hook(hook))
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        steps = self.around(request)
+        next(steps)
+        try:
+            response = self.get_response(request)
+        except Exception as error:
+            steps.throw(error)
+            raise
+        return self.finish(steps, response)
+
+    async def __acall__(self, request):
+        steps = self.around(request)
+        next(steps)
+        try:
+            response = await self.get_response(request)
+        except Exception as error:
+            steps.throw(error)
+            raise
+        return self.finish(steps, response)
+
+    def finish(self, steps, response):
+        try:
+            steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+        raise RuntimeError(f'{type(self).__name__}.around() yielded twice')
+
+    def around(self, request):
+        raise NotImplementedError
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    """Log requests that run more SQL queries than QUERY_BUDGETS allow."""
+
+    def around(self, request):
+        with ExitStack() as stack:
+            counter = count_queries(stack)
+            response = yield
+        key = getattr(request, 'query_budget_key', None)
+        budget = settings.QUERY_BUDGETS.get(key)
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                'Query budget exceeded: %s ran %d queries, budget %d (%s)',
+                key, counter.count, budget, request.get_full_path()
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget_key = get_view_key(view_func, request.method)
+
+
+class ServerTimingMiddleware(AsyncCapableMiddleware):
+    """Report SQL, serializer, render and total time of every request.
+
+    The timings go to a Server-Timing header and to the api.timing log.
+    serialize is the view time without SQL: DRF serializers evaluate
+    querysets lazily, so their own work is what remains. A share of
+    requests set by PROFILING_SAMPLE_RATE is also run under cProfile and
+    dumped to PROFILING_DIR.
+    """
+
+    def around(self, request):
+        started = time.perf_counter()
+        profiler = None
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            counter = count_queries(stack)
+            if profiler is not None:
+                profiler.enable()
+                stack.callback(profiler.disable)
+            response = yield
+        finished = time.perf_counter()
+        view_started = getattr(request, 'view_started', finished)
+        view_finished = getattr(request, 'view_finished', finished)
+        rendered = getattr(request, 'rendered', view_finished)
+        timings = {
+            'db': counter.duration,
+            'serialize': max(
+                view_finished - view_started - counter.duration, 0
+            ),
+            'render': rendered - view_finished,
+            'total': finished - started,
+        }
+        view_key = getattr(request, 'view_key', None) or '-'
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={duration * 1000:.1f}'
+                for name, duration in timings.items()
+            ) + f', queries;desc="{counter.count}"'
+        timing_logger.info(
+            '%s %s %s view=%s queries=%d %s',
+            request.method, request.path, response.status_code, view_key,
+            counter.count, ' '.join(
+                f'{name}_ms={duration * 1000:.1f}'
+                for name, duration in timings.items()
+            )
+        )
+        if profiler is not None:
+            self.dump_profile(profiler, view_key)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_key = get_view_key(view_func, request.method)
+        request.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request.view_finished = time.perf_counter()
+        response.add_post_render_callback(
+            lambda response: setattr(
+                request, 'rendered', time.perf_counter()
+            )
+        )
+        return response
+
+    def dump_profile(self, profiler, view_key):
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(
+            settings.PROFILING_DIR,
+            f'{time.strftime("%Y%m%d-%H%M%S")}-{view_key}-{os.getpid()}.prof'
+        ))
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """Record request count, latency and SQL queries per view."""
+
+    def around(self, request):
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            counter = count_queries(stack)
+            response = yield
+        observe_request(
+            request, response, time.perf_counter() - started, counter.count
+        )
+        return response
+
+
+def get_primary_pin_key(request):
+    identity = request.headers.get('Authorization') or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not identity:
+        return None
+    return 'primary_pin:' + hashlib.md5(identity.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """Allow replica reads for safe requests, except right after a write.
+
+    A client that sent a non-safe request is pinned to the primary for
+    DATABASE_REPLICA_PIN_SECONDS so it reads its own writes. The pin is
+    kept in the cache, which has to be shared between workers.
+    """
+
+    def around(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return (yield)
+        pin_key = get_primary_pin_key(request)
+        if request.method not in SAFE_METHODS:
+            response = yield
+            if pin_key:
+                cache.set(
+                    pin_key, True, settings.DATABASE_REPLICA_PIN_SECONDS
+                )
+            return response
+        if pin_key and cache.get(pin_key):
+            return (yield)
+        token = read_from_replica.set(True)
+        try:
+            return (yield)
+        finally:
+            read_from_replica.reset(token)
@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class CacheVersion(models.Model):
+    key = models.CharField(max_length=100, unique=True, verbose_name='Ключ')
+    version = models.PositiveBigIntegerField(
+        default=1, verbose_name='Версия'
+    )
+
+    class Meta:
+        verbose_name = 'Версия кэша'
+        verbose_name_plural = 'Версии кэша'
+
+    def __str__(self):
+        return f'{self.key}: {self.version}'
@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from django.conf import settings
 
 
@@ -10,3 +10,13 @@ class CustomUserPagionation(PageNumberPagination):
 class CustomPecipePagionation(PageNumberPagination):
     page_size = settings.RECIPE_PAG_PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size = settings.RECIPE_PAG_PAGE_SIZE
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    ordering = ('-pub_date', '-recipe_id')
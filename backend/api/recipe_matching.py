@@ -0,0 +1,24 @@
+from django.db.models import Count, F
+
+from recipes.models import IngredientRecipe
+
+
+def match_recipes(ingredients, max_missing=None):
+    """Recipes using any of ``ingredients``, best covered first.
+
+    Only the entries of the given ingredients are read from the
+    (ingredient, recipe) unique index, which serves as the inverted
+    index. The number of matches per recipe is compared with the stored
+    Recipe.ingredients_count, so recipes are never scanned as a whole.
+    """
+    matches = IngredientRecipe.objects.filter(
+        ingredient__in=ingredients
+    ).values('recipe_id').annotate(
+        matched_ingredients=Count('pk'),
+        missing_ingredients=F('recipe__ingredients_count') - Count('pk'),
+    )
+    if max_missing is not None:
+        matches = matches.filter(missing_ingredients__lte=max_missing)
+    return matches.order_by(
+        'missing_ingredients', '-matched_ingredients', '-recipe_id'
+    )
@@ -0,0 +1,124 @@
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Value, When
+
+from api.cache_versions import bump_version, get_version
+from api.ingredient_index import fold
+from recipes.models import Recipe
+
+RECIPE_SEARCH_VERSION_KEY = 'recipe_search_version'
+WORD = re.compile(r'\w+')
+MIN_STEM_LENGTH = 3
+NAME_WEIGHT = 1.0
+TEXT_WEIGHT = 0.4
+RUSSIAN_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ешь',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ом', 'ем',
+    'ах', 'ях', 'ам', 'ям', 'ов', 'ев', 'ую', 'юю', 'ть', 'ет', 'ут', 'ют',
+    'ит', 'ат', 'ят', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+
+
+def stem(word):
+    for ending in RUSSIAN_ENDINGS:
+        if (
+            word.endswith(ending)
+            and len(word) - len(ending) >= MIN_STEM_LENGTH
+        ):
+            return word[:-len(ending)]
+    return word
+
+
+def stems(value):
+    return [stem(word) for word in WORD.findall(fold(value))]
+
+
+def has_full_text_search(using):
+    """Whether search runs in the database instead of the local index."""
+    return connections[using].vendor == 'postgresql'
+
+
+def invalidate_recipe_search_index():
+    bump_version(RECIPE_SEARCH_VERSION_KEY)
+
+
+class RecipeSearchIndex:
+    """Process-local inverted index of recipe names and texts.
+
+    Fallback for databases without full-text search. Words are reduced
+    by a light suffix-stripping stemmer, every query word has to match
+    and recipes are ranked with the weights ts_rank gives to the name
+    and text of the search vector.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._postings = {}
+
+    def _build(self, version):
+        postings = defaultdict(lambda: defaultdict(float))
+        for pk, name, text in Recipe.objects.values_list(
+            'pk', 'name', 'text'
+        ).iterator():
+            for word in stems(name):
+                postings[word][pk] += NAME_WEIGHT
+            for word in stems(text):
+                postings[word][pk] += TEXT_WEIGHT
+        self._postings = {
+            word: dict(recipes) for word, recipes in postings.items()
+        }
+        self._version = version
+
+    def _ensure_fresh(self):
+        version = get_version(RECIPE_SEARCH_VERSION_KEY)
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._build(version)
+        return self._postings
+
+    def search(self, query):
+        postings = self._ensure_fresh()
+        ranks = None
+        for word in set(stems(query)):
+            matches = postings.get(word, {})
+            if ranks is None:
+                ranks = dict(matches)
+            else:
+                ranks = {
+                    pk: rank + matches[pk]
+                    for pk, rank in ranks.items() if pk in matches
+                }
+            if not ranks:
+                break
+        return ranks or {}
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, query):
+    """Filter recipes by a search query, most relevant first."""
+    if has_full_text_search(queryset.db):
+        search_query = SearchQuery(
+            query, config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        )
+    else:
+        ranks = recipe_search_index.search(query)
+        queryset = queryset.filter(pk__in=ranks).annotate(
+            search_rank=Case(
+                *(When(pk=pk, then=Value(rank)) for pk, rank in ranks.items()),
+                output_field=FloatField(),
+            )
+        )
+    return queryset.order_by('-search_rank', *Recipe._meta.ordering)
@@ -0,0 +1,146 @@
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_save
+
+from recipes.models import Recipe, ShoppingCart
+from recipes.signals import RECIPE_COUNTERS, refresh_cart_recipes
+
+
+@transaction.atomic
+def add_relation(model, **fields):
+    """Insert a relation row, relying on its unique constraint.
+
+    Returns False when the row already exists or a check constraint
+    rejects it. post_save is sent after the savepoint of the insert, so
+    an IntegrityError raised by a receiver is not taken for a duplicate.
+    """
+    instance = model(**fields)
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create((instance,))
+    except IntegrityError:
+        return False
+    post_save.send(
+        sender=model, instance=instance, created=True, update_fields=None,
+        raw=False, using=router.db_for_write(model)
+    )
+    return True
+
+
+def remove_relation(model, **fields):
+    _, deleted = model.objects.filter(**fields).delete()
+    return bool(deleted.get(model._meta.label))
+
+
+def get_relation_states(model, user, recipe_ids):
+    return dict(
+        Recipe.objects.filter(pk__in=recipe_ids).annotate(
+            selected=Exists(
+                model.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+        ).values_list('pk', 'selected')
+    )
+
+
+def relations_changed(model, user, recipe_ids, delta):
+    """Apply what the per-row relation signals do, once for a batch."""
+    Recipe.change_counter(recipe_ids, RECIPE_COUNTERS[model], delta)
+    if model is ShoppingCart:
+        refresh_cart_recipes(user.id, recipe_ids)
+
+
+def batch_results(recipe_ids, states, changed_ids, changed, unchanged):
+    results = []
+    for recipe_id in recipe_ids:
+        if recipe_id not in states:
+            result = 'not_found'
+        elif recipe_id in changed_ids:
+            result = changed
+        else:
+            result = unchanged
+        results.append({'id': recipe_id, 'status': result})
+    return results
+
+
+def insert_relations(model, user, recipe_ids):
+    """Insert relation rows, returning the recipe ids inserted here.
+
+    When a concurrent request inserts one of the rows first, the batch
+    is retried row by row, so that row is not counted twice.
+    """
+    if not recipe_ids:
+        return set()
+    rows = [model(user=user, recipe_id=recipe_id) for recipe_id in recipe_ids]
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(rows)
+        return set(recipe_ids)
+    except IntegrityError:
+        pass
+    inserted = set()
+    for row in rows:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create((row,))
+        except IntegrityError:
+            continue
+        inserted.add(row.recipe_id)
+    return inserted
+
+
+def delete_relations(model, user, recipe_ids=None):
+    """Delete relation rows, returning the recipe ids deleted here.
+
+    One DELETE ... RETURNING statement, so rows removed concurrently are
+    not counted twice. No per-row signals are sent; the caller applies
+    their effects once through relations_changed().
+    """
+    if recipe_ids is not None and not recipe_ids:
+        return set()
+    connection = connections[router.db_for_write(model)]
+    table, user_column, recipe_column = (
+        connection.ops.quote_name(name) for name in (
+            model._meta.db_table,
+            model._meta.get_field('user').column,
+            model._meta.get_field('recipe').column,
+        )
+    )
+    sql = f'DELETE FROM {table} WHERE {user_column} = %s'
+    params = [user.pk]
+    if recipe_ids is not None:
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        sql += f' AND {recipe_column} IN ({placeholders})'
+        params.extend(recipe_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {recipe_column}', params)
+        return {recipe_id for recipe_id, in cursor.fetchall()}
+
+
+@transaction.atomic
+def add_relations(model, user, recipe_ids):
+    states = get_relation_states(model, user, recipe_ids)
+    new_ids = insert_relations(model, user, [
+        recipe_id for recipe_id, selected in states.items() if not selected
+    ])
+    if new_ids:
+        relations_changed(model, user, new_ids, 1)
+    return batch_results(recipe_ids, states, new_ids, 'added', 'exists')
+
+
+@transaction.atomic
+def remove_relations(model, user, recipe_ids):
+    states = get_relation_states(model, user, recipe_ids)
+    old_ids = delete_relations(model, user, [
+        recipe_id for recipe_id, selected in states.items() if selected
+    ])
+    if old_ids:
+        relations_changed(model, user, old_ids, -1)
+    return batch_results(recipe_ids, states, old_ids, 'removed', 'missing')
+
+
+@transaction.atomic
+def clear_shopping_cart(user):
+    recipe_ids = delete_relations(ShoppingCart, user)
+    if recipe_ids:
+        relations_changed(ShoppingCart, user, recipe_ids, -1)
+    return len(recipe_ids)
@@ -1,24 +1,76 @@
 import base64
+import binascii
 
+from django.conf import settings
 from django.db import transaction
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
 
+from api.user_relations import get_user_relations
 from recipes.models import (
     Tag, Recipe, Ingredient,
-    IngredientRecipe, Favorite, ShoppingCart
+    IngredientRecipe, ShoppingListItem
 )
-from users.models import User, Subscribe
+from recipes.signals import batched, refresh_recipe_carts
+from users.models import User, UserCounters
 
 
 class Base64ImageField(serializers.ImageField):
+    def __init__(self, *args, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(*args, **kwargs)
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+            if len(imgstr) > settings.RECIPE_IMAGE_MAX_SIZE * 4 // 3 + 4:
+                raise serializers.ValidationError(
+                    'Размер изображения превышает допустимый.'
+                )
+            try:
+                decoded = base64.b64decode(imgstr, validate=True)
+            except binascii.Error:
+                raise serializers.ValidationError(
+                    'Изображение повреждено.'
+                )
+            data = ContentFile(decoded, name='temp.' + ext)
+        image_file = super().to_internal_value(data)
+        image = getattr(image_file, 'image', None)
+        if image is not None:
+            if image.format not in settings.RECIPE_IMAGE_FORMATS:
+                raise serializers.ValidationError(
+                    'Неподдерживаемый формат изображения.'
+                )
+            if max(image.size) > settings.RECIPE_IMAGE_MAX_DIMENSION:
+                raise serializers.ValidationError(
+                    'Размеры изображения превышают допустимые.'
+                )
+        return image_file
+
+    def to_representation(self, value):
+        variant = self.variant or self.context.get('image_variant')
+        name = value and variant and value.instance.image_variants.get(
+            variant
+        )
+        if not name:
+            return super().to_representation(value)
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+def user_relation(serializer, relation, obj):
+    page = ()
+    if isinstance(serializer.parent, serializers.ListSerializer):
+        page = serializer.parent.instance or ()
+    return get_user_relations(serializer.context['request']).contains(
+        relation, obj.pk, page_ids=(item.pk for item in page)
+    )
 
 
 class CustomDjoserUserCreateSerializer(UserCreateSerializer):
@@ -42,11 +94,9 @@ class CustomDjoserUserSerializer(UserCreateSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        if self.context['request'].user.is_anonymous:
-            return False
-        return Subscribe.objects.filter(
-            subscriber=self.context['request'].user, author=obj
-        ).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return user_relation(self, 'subscriptions', obj)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -70,18 +120,20 @@ class IngredientsRecipeSerializer(serializers.ModelSerializer):
 
 
 class IngredientsRecipeSafeMethodSerializer(serializers.ModelSerializer):
-    id = serializers.SerializerMethodField()
-    name = serializers.SerializerMethodField()
-    measurement_unit = serializers.SerializerMethodField()
-
-    def get_id(self, obj):
-        return obj.ingredient.id
-
-    def get_name(self, obj):
-        return obj.ingredient.name
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
 
-    def get_measurement_unit(self, obj):
-        return obj.ingredient.measurement_unit
+    def to_representation(self, instance):
+        ingredient = instance.ingredient
+        return {
+            'id': ingredient.id,
+            'name': ingredient.name,
+            'measurement_unit': ingredient.measurement_unit,
+            'amount': instance.amount,
+        }
 
     class Meta:
         model = IngredientRecipe
@@ -100,27 +152,27 @@ class RecipeSafeMethodSerializer(serializers.ModelSerializer):
 
     def get_ingredients(self, obj):
         return IngredientsRecipeSafeMethodSerializer(
-            IngredientRecipe.objects.filter(recipe=obj),
+            obj.ingredientrecipe_set.all(),
             many=True
         ).data
 
     def get_is_favorited(self, obj):
-        if self.context['request'].user.is_anonymous:
-            return False
-        return Favorite.objects.filter(
-            user=self.context['request'].user, recipe=obj
-        ).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return user_relation(self, 'favorites', obj)
 
     def get_is_in_shopping_cart(self, obj):
-        if self.context['request'].user.is_anonymous:
-            return False
-        return ShoppingCart.objects.filter(
-            user=self.context['request'].user, recipe=obj
-        ).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return user_relation(self, 'shopping_cart', obj)
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        fields = (
+            'id', 'tags', 'author', 'ingredients', 'image',
+            'is_favorited', 'is_in_shopping_cart',
+            'name', 'text', 'cooking_time',
+        )
 
 
 class RecipeSerializer(RecipeSafeMethodSerializer):
@@ -134,7 +186,9 @@ class RecipeSerializer(RecipeSafeMethodSerializer):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(
-            author=self.context.get('request').user, **validated_data
+            author=self.context.get('request').user,
+            ingredients_count=len(ingredients),
+            **validated_data
         )
         recipe.tags.set(tags)
         ingredient_recipe_list = []
@@ -154,18 +208,55 @@ class RecipeSerializer(RecipeSafeMethodSerializer):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         instance.tags.set(tags)
-        instance.ingredients.clear()
-        ingredient_recipe_list = []
+        changed_ingredients = self.update_ingredients(instance, ingredients)
+        if changed_ingredients:
+            refresh_recipe_carts(instance.pk, changed_ingredients)
+        validated_data['ingredients_count'] = len(ingredients)
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        if changed_fields:
+            for field in changed_fields:
+                setattr(instance, field, validated_data[field])
+            instance.save(update_fields=changed_fields)
+        return instance
+
+    def update_ingredients(self, instance, ingredients):
+        existing = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in instance.ingredientrecipe_set.all()
+        }
+        created = []
+        updated = []
         for ingredient in ingredients:
-            ingredient_recipe_list.append(
-                IngredientRecipe(
+            ingredient_recipe = existing.pop(ingredient['id'], None)
+            if ingredient_recipe is None:
+                created.append(IngredientRecipe(
                     ingredient_id=ingredient['id'],
                     recipe=instance,
                     amount=ingredient['amount']
-                )
+                ))
+            elif ingredient_recipe.amount != ingredient['amount']:
+                ingredient_recipe.amount = ingredient['amount']
+                updated.append(ingredient_recipe)
+        if existing:
+            removed = IngredientRecipe.objects.filter(
+                pk__in=[
+                    ingredient_recipe.pk
+                    for ingredient_recipe in existing.values()
+                ]
             )
-        IngredientRecipe.objects.bulk_create(ingredient_recipe_list)
-        return super().update(instance, validated_data)
+            with batched(IngredientRecipe):
+                removed.delete()
+        if updated:
+            IngredientRecipe.objects.bulk_update(updated, ('amount',))
+        if created:
+            IngredientRecipe.objects.bulk_create(created)
+        return {
+            ingredient_recipe.ingredient_id
+            for ingredient_recipe in (*existing.values(), *updated, *created)
+        }
 
     def to_representation(self, instance):
         return RecipeSafeMethodSerializer(
@@ -186,32 +277,90 @@ class RecipeSerializer(RecipeSafeMethodSerializer):
 
 
 class RecipeShortSerializer(RecipeSafeMethodSerializer):
+    image = Base64ImageField(variant=settings.RECIPE_IMAGE_LIST_VARIANT)
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time',)
 
 
+class RecipeBatchSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_MAX_SIZE,
+    )
+
+    def validate_recipes(self, data):
+        return list(dict.fromkeys(data))
+
+
+class RecipeMatchQuerySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_MATCH_MAX_INGREDIENTS,
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+    def validate_ingredients(self, data):
+        return list(dict.fromkeys(data))
+
+
+class RecipeMatchSerializer(RecipeSafeMethodSerializer):
+    matched_ingredients = serializers.IntegerField(read_only=True)
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id', 'tags', 'author', 'ingredients', 'image',
+            'is_favorited', 'is_in_shopping_cart',
+            'matched_ingredients', 'missing_ingredients',
+            'name', 'text', 'cooking_time',
+        )
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount',)
+
+
+class SubscriptionsQuerySerializer(serializers.Serializer):
+    recipes_limit = serializers.IntegerField(min_value=0, required=False)
+
+
 class SubscribeSerializer(CustomDjoserUserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
     def get_recipes(self, obj):
-        if 'recipes_limit' in self.context.get('request').GET:
-            return RecipeShortSerializer(
-                Recipe.objects.filter(author=obj)[
-                    :int(self.context.get('request').GET['recipes_limit'])
-                ],
-                context={'request': self.context.get('request')},
-                many=True
-            ).data
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = Recipe.objects.filter(author=obj)[
+                :self.context.get('recipes_limit')
+            ]
         return RecipeShortSerializer(
-            Recipe.objects.filter(author=obj),
+            recipes,
             context={'request': self.context.get('request')},
             many=True
         ).data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        try:
+            return obj.counters.recipes_count
+        except UserCounters.DoesNotExist:
+            return Recipe.objects.filter(author=obj).count()
 
     class Meta:
         model = User
@@ -0,0 +1,144 @@
+import csv
+import io
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from api.cache_versions import bump_versions, get_version
+from api.metrics import count_cache_lookup
+from recipes.models import ShoppingListItem
+
+CART_VERSION_KEY = 'shopping_cart_version:{user_id}'
+PDF_KEY = 'shopping_list_pdf:{user_id}:{version}'
+PDF_FONT_NAME = 'ShoppingListFont'
+SHOPPING_LIST_FORMATS = {
+    'txt': ('text/plain', ''),
+    'csv': ('text/csv', '.csv'),
+    'pdf': ('application/pdf', '.pdf'),
+}
+
+
+def get_ingredient_totals(user):
+    return ShoppingListItem.objects.filter(user=user).values(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).order_by('ingredient__name')
+
+
+def iter_ingredient_totals(user):
+    return get_ingredient_totals(user).iterator(
+        chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
+    )
+
+
+def get_cart_version(user_id):
+    return get_version(CART_VERSION_KEY.format(user_id=user_id))
+
+
+def bump_cart_versions(user_ids):
+    bump_versions(
+        CART_VERSION_KEY.format(user_id=user_id) for user_id in user_ids
+    )
+
+
+def format_line(number, ingredient):
+    return (
+        f'{number}. {ingredient["ingredient__name"]} '
+        f'({ingredient["ingredient__measurement_unit"]})'
+        f' - {ingredient["amount"]}'
+    )
+
+
+def txt_line(number, ingredient):
+    return ('\n' if number > 1 else '') + format_line(number, ingredient)
+
+
+def txt_lines(ingredients):
+    for number, ingredient in enumerate(ingredients, start=1):
+        yield txt_line(number, ingredient)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+csv_writer = csv.writer(_Echo())
+CSV_HEADER = csv_writer.writerow(('Ингредиент', 'Ед. изм.', 'Количество'))
+
+
+def csv_line(number, ingredient):
+    return csv_writer.writerow((
+        ingredient['ingredient__name'],
+        ingredient['ingredient__measurement_unit'],
+        ingredient['amount'],
+    ))
+
+
+def csv_lines(ingredients):
+    yield CSV_HEADER
+    for number, ingredient in enumerate(ingredients, start=1):
+        yield csv_line(number, ingredient)
+
+
+# Header and line formatter of the text formats, for the async export.
+TEXT_FORMATS = {
+    'txt': ('', txt_line),
+    'csv': (CSV_HEADER, csv_line),
+}
+
+
+def _register_pdf_font():
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    if not os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+        return 'Helvetica'
+    pdfmetrics.registerFont(
+        TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+    )
+    return PDF_FONT_NAME
+
+
+def render_pdf(ingredients):
+    font = _register_pdf_font()
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    height = A4[1]
+    margin, line_height = 50, 18
+    y = height - margin
+    pdf.setFont(font, 16)
+    pdf.drawString(margin, y, 'Список покупок')
+    y -= line_height * 2
+    pdf.setFont(font, 12)
+    for i, ingredient in enumerate(ingredients):
+        if y < margin:
+            pdf.showPage()
+            pdf.setFont(font, 12)
+            y = height - margin
+        pdf.drawString(margin, y, format_line(i + 1, ingredient))
+        y -= line_height
+    pdf.save()
+    return buffer.getvalue()
+
+
+def get_pdf(user):
+    key = PDF_KEY.format(
+        user_id=user.id, version=get_cart_version(user.id)
+    )
+    content = cache.get(key)
+    count_cache_lookup(
+        'shopping_list_pdf', 'miss' if content is None else 'hit'
+    )
+    if content is None:
+        content = render_pdf(iter_ingredient_totals(user))
+        cache.set(key, content, settings.SHOPPING_LIST_PDF_CACHE_TIMEOUT)
+    return content
+
+
+def iter_bytes(content, chunk_size=8192):
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size]
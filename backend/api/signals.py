@@ -0,0 +1,51 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.catalogue_cache import invalidate_tags
+from api.ingredient_index import invalidate_ingredient_index
+from api.middleware import install_query_recorder
+from api.recipe_search import (
+    has_full_text_search, invalidate_recipe_search_index
+)
+from api.shopping_list import bump_cart_versions
+from recipes.models import (
+    Ingredient, Recipe, ShoppingListItem, Tag, shopping_list_changed
+)
+from recipes.signals import RECIPE_SEARCH_FIELDS
+
+
+@receiver(shopping_list_changed)
+def shopping_list_refreshed(sender, user_ids, **kwargs):
+    bump_cart_versions(user_ids)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_search_changed(sender, using, update_fields=None, **kwargs):
+    if has_full_text_search(using):
+        return
+    if update_fields is None or RECIPE_SEARCH_FIELDS & update_fields:
+        invalidate_recipe_search_index()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    invalidate_ingredient_index()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        bump_cart_versions(ShoppingListItem.objects.filter(
+            ingredient=instance
+        ).values_list('user_id', flat=True))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    invalidate_tags()
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_recorder(connection)
@@ -0,0 +1,43 @@
+from unittest.mock import patch
+
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITransactionTestCase
+
+from api.db_router import ReplicaRouter, read_from_replica
+from users.models import User
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(APITransactionTestCase):
+    def setUp(self):
+        User.objects.create_user(
+            username='reader', email='reader@example.org',
+            password='password', first_name='Reader', last_name='Reader'
+        )
+
+    def test_token_from_login_is_read_from_primary(self):
+        response = self.client.post('/api/auth/token/login/', {
+            'email': 'reader@example.org', 'password': 'password',
+        })
+        self.assertEqual(response.status_code, 200)
+        token = response.data['auth_token']
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record_db_for_read(router, model, **hints):
+            routed.append((
+                model, db_for_read(router, model, **hints),
+                read_from_replica.get()
+            ))
+            # The test database has no replica; run every read on it.
+            return 'default'
+
+        with patch.object(ReplicaRouter, 'db_for_read', record_db_for_read):
+            response = self.client.get(
+                '/api/users/me/', HTTP_AUTHORIZATION=f'Token {token}'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], 'reader@example.org')
+        self.assertIn((Token, 'default', True), routed)
+        self.assertNotIn((Token, 'replica', True), routed)
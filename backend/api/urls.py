@@ -1,6 +1,9 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 
+from api import async_views
+from api.metrics import metrics_view
 from api.views import (
     CustomDjoserUserViewSet,
     TagViewSet,
@@ -9,12 +12,46 @@ from api.views import (
 )
 
 router = DefaultRouter()
-router.register('users', CustomDjoserUserViewSet)
-router.register('tags', TagViewSet)
-router.register('ingredients', IngredientViewSet)
-router.register('recipes', RecipeViewSet)
+router.register('users', CustomDjoserUserViewSet, basename='users')
+router.register('tags', TagViewSet, basename='tags')
+router.register('ingredients', IngredientViewSet, basename='ingredients')
+router.register('recipes', RecipeViewSet, basename='recipes')
 
-urlpatterns = [
+
+def router_view(name):
+    return next(url.callback for url in router.urls if url.name == name)
+
+
+def async_read_path(route, handler, name):
+    return re_path(
+        route,
+        async_views.async_read_view(handler, router_view(name)),
+        name=name
+    )
+
+
+urlpatterns = []
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns += [
+        async_read_path(r'^tags/$', async_views.tag_list, 'tags-list'),
+        async_read_path(
+            r'^ingredients/$', async_views.ingredient_list,
+            'ingredients-list'
+        ),
+        async_read_path(
+            r'^recipes/download_shopping_cart/$',
+            async_views.download_shopping_cart,
+            'recipes-download-shopping-cart'
+        ),
+        async_read_path(
+            r'^recipes/(?P<pk>[0-9]+)/$', async_views.recipe_detail,
+            'recipes-detail'
+        ),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
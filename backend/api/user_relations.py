@@ -0,0 +1,70 @@
+from django.conf import settings
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribe
+
+RELATIONS = {
+    'favorites': (Favorite, 'user', 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'user', 'recipe_id'),
+    'subscriptions': (Subscribe, 'subscriber', 'author_id'),
+}
+
+
+class UserRelations:
+    """Favorite, cart and subscription ids of the requesting user.
+
+    Each set is loaded on first use. Sets larger than
+    USER_RELATIONS_MAX_SIZE are not kept in memory; membership is then
+    looked up for the ids of the serialized page only.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.ids = {}
+        self.checked = {}
+
+    def get_queryset(self, relation):
+        model, user_field, _ = RELATIONS[relation]
+        return model.objects.filter(**{user_field: self.user})
+
+    def load(self, relation):
+        field = RELATIONS[relation][2]
+        limit = settings.USER_RELATIONS_MAX_SIZE
+        ids = set(
+            self.get_queryset(relation).values_list(
+                field, flat=True
+            )[:limit + 1]
+        )
+        if len(ids) > limit:
+            self.checked[relation] = set()
+            return set()
+        return ids
+
+    def load_page(self, relation, page_ids):
+        field = RELATIONS[relation][2]
+        page_ids = set(page_ids) - self.checked[relation]
+        self.ids[relation].update(
+            self.get_queryset(relation).filter(
+                **{f'{field}__in': page_ids}
+            ).values_list(field, flat=True)
+        )
+        self.checked[relation].update(page_ids)
+
+    def contains(self, relation, pk, page_ids=()):
+        if self.user.is_anonymous:
+            return False
+        if relation not in self.ids:
+            self.ids[relation] = self.load(relation)
+        if (
+            relation in self.checked
+            and pk not in self.checked[relation]
+        ):
+            self.load_page(relation, {pk, *page_ids})
+        return pk in self.ids[relation]
+
+
+def get_user_relations(request):
+    relations = getattr(request, 'user_relations', None)
+    if relations is None:
+        relations = request.user_relations = UserRelations(request.user)
+    return relations
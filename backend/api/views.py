@@ -1,5 +1,9 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import (
+    Exists, F, OuterRef, Prefetch, Value, Window
+)
+from django.db.models.functions import Coalesce, RowNumber
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
@@ -10,24 +14,46 @@ from rest_framework.permissions import (
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from api.fast_read import ValuesListMixin, recipe_rows, recipe_values
 from api.filters import RecipeFilter, IngredientFilter
-from api.pagination import CustomUserPagionation, CustomPecipePagionation
+from api.catalogue_cache import CatalogueCacheMixin, TAGS_VERSION_KEY
+from api.ingredient_index import INGREDIENTS_VERSION_KEY, ingredient_index
+from api.metrics import count_export_bytes
+from api.negotiation import IgnoreFormatContentNegotiation
+from api.pagination import (
+    CustomUserPagionation, CustomPecipePagionation, FeedCursorPagination,
+    RecipeCursorPagination
+)
 from api.permissions import IsAuthorOrAdminPermission
+from api.recipe_matching import match_recipes
+from api.relations import (
+    add_relation, add_relations, clear_shopping_cart, remove_relation,
+    remove_relations
+)
 from api.serializers import (
     TagSerializer, IngredientSerializer,
     RecipeSerializer, RecipeSafeMethodSerializer,
-    SubscribeSerializer, RecipeShortSerializer
+    SubscribeSerializer, RecipeShortSerializer, RecipeBatchSerializer,
+    ShoppingListItemSerializer, RecipeMatchQuerySerializer,
+    RecipeMatchSerializer, SubscriptionsQuerySerializer
+)
+from api.shopping_list import (
+    SHOPPING_LIST_FORMATS, csv_lines, get_pdf, iter_bytes,
+    iter_ingredient_totals, txt_lines
 )
 from users.models import User, Subscribe
 from recipes.models import (
     Tag, Recipe,
-    Ingredient, Favorite, ShoppingCart, IngredientRecipe
+    Ingredient, Favorite, ShoppingCart, ShoppingListItem, FeedEntry
 )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    CatalogueCacheMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    catalogue_version_key = TAGS_VERSION_KEY
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -37,50 +63,73 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.for_read(self.request.user)
+        return super().get_queryset()
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.action == 'list' and (
+            RecipeCursorPagination.cursor_query_param
+            in self.request.query_params
+            or self.request.query_params.get('pagination') == 'cursor'
+        ):
+            self._paginator = RecipeCursorPagination()
+        return super().paginator
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeSafeMethodSerializer
         return RecipeSerializer
 
-    @action(
-        detail=True,
-        methods=('post', 'delete'),
-        permission_classes=(IsAuthenticated,),
-    )
-    def favorite(self, request, pk):
-        if self.request.method == 'POST':
-            if Favorite.objects.filter(
-                user=self.request.user,
-                recipe=get_object_or_404(Recipe, pk=pk)
-            ).exists():
+    def list(self, request, *args, **kwargs):
+        queryset = recipe_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        rows = recipe_rows(
+            list(queryset) if page is None else page, request,
+            settings.RECIPE_IMAGE_LIST_VARIANT
+        )
+        if page is None:
+            return Response(rows)
+        return self.get_paginated_response(rows)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'what_to_cook', 'feed'):
+            context['image_variant'] = settings.RECIPE_IMAGE_LIST_VARIANT
+        return context
+
+    def toggle_relation(self, request, pk, model, exists_error,
+                        missing_error):
+        if request.method == 'POST':
+            recipe = get_object_or_404(Recipe, pk=pk)
+            if not add_relation(model, user=request.user, recipe=recipe):
                 return Response({
-                    'errors': 'Рецепт уже добавлен'
+                    'errors': exists_error
                 }, status=status.HTTP_400_BAD_REQUEST)
-
-            Favorite.objects.create(
-                user=self.request.user,
-                recipe=get_object_or_404(Recipe, pk=pk)
-            )
             return Response(
                 RecipeShortSerializer(
-                    get_object_or_404(Recipe, pk=pk),
-                    context={'request': request}
+                    recipe, context={'request': request}
                 ).data, status=status.HTTP_201_CREATED
             )
-        if self.request.method == 'DELETE':
-            if not Favorite.objects.filter(
-                user=self.request.user,
-                recipe=get_object_or_404(Recipe, pk=pk)
-            ).exists():
-                return Response({
-                    'errors': 'Рецепт не добавлен в избранное'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            get_object_or_404(
-                Favorite,
-                user=self.request.user,
-                recipe=get_object_or_404(Recipe, pk=pk)
-            ).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        if not remove_relation(model, user=request.user, recipe_id=pk):
+            get_object_or_404(Recipe.objects.only('id'), pk=pk)
+            return Response({
+                'errors': missing_error
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        detail=True,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite(self, request, pk):
+        return self.toggle_relation(
+            request, pk, Favorite,
+            'Рецепт уже добавлен', 'Рецепт не добавлен в избранное'
+        )
 
     @action(
         detail=True,
@@ -88,78 +137,173 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def shopping_cart(self, request, pk):
-        if self.request.method == 'POST':
-            if ShoppingCart.objects.filter(
-                user=self.request.user,
-                recipe=get_object_or_404(Recipe, pk=pk)
-            ).exists():
-                return Response({
-                    'errors': 'Рецепт уже добавлен в корзину'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            ShoppingCart.objects.create(
-                user=self.request.user,
-                recipe=get_object_or_404(Recipe, pk=pk)
-            )
-            return Response(
-                RecipeShortSerializer(
-                    get_object_or_404(Recipe, pk=pk),
-                    context={'request': request}
-                ).data, status=status.HTTP_201_CREATED
-            )
-        if self.request.method == 'DELETE':
-            if not ShoppingCart.objects.filter(
-                user=self.request.user,
-                recipe=get_object_or_404(Recipe, pk=pk)
-            ).exists():
-                return Response({
-                    'errors': 'Рецепт не добавлен в корзину'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            get_object_or_404(
-                ShoppingCart,
-                user=self.request.user,
-                recipe=get_object_or_404(Recipe, pk=pk)
-            ).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        return self.toggle_relation(
+            request, pk, ShoppingCart,
+            'Рецепт уже добавлен в корзину', 'Рецепт не добавлен в корзину'
+        )
+
+    def batch_relations(self, request, model):
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            results = add_relations(model, request.user, recipe_ids)
+        else:
+            results = remove_relations(model, request.user, recipe_ids)
+        return Response(results)
 
     @action(
         detail=False,
-        permission_classes=(IsAuthenticated,)
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite',
+        url_name='favorite-batch',
+    )
+    def favorite_batch(self, request):
+        return self.batch_relations(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+    )
+    def shopping_cart_batch(self, request):
+        return self.batch_relations(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=('delete',),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart/clear',
+    )
+    def clear_shopping_cart(self, request):
+        clear_shopping_cart(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_list(self, request):
+        items = ShoppingListItem.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by('ingredient__name')
+        return Response(ShoppingListItemSerializer(items, many=True).data)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        paginator = FeedCursorPagination()
+        entries = paginator.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user).only(
+                'recipe_id', 'pub_date'
+            ),
+            request, view=self
+        )
+        recipes = Recipe.objects.for_read(request.user).in_bulk(
+            [entry.recipe_id for entry in entries]
+        )
+        serializer = self.get_serializer(
+            [
+                recipes[entry.recipe_id] for entry in entries
+                if entry.recipe_id in recipes
+            ],
+            many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False)
+    def what_to_cook(self, request):
+        query = RecipeMatchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        matches = self.paginate_queryset(
+            match_recipes(**query.validated_data)
+        )
+        recipes = Recipe.objects.for_read(request.user).in_bulk(
+            [match['recipe_id'] for match in matches]
+        )
+        page = []
+        for match in matches:
+            recipe = recipes.get(match['recipe_id'])
+            if recipe is not None:
+                recipe.matched_ingredients = match['matched_ingredients']
+                recipe.missing_ingredients = match['missing_ingredients']
+                page.append(recipe)
+        serializer = RecipeMatchSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=IgnoreFormatContentNegotiation,
     )
     def download_shopping_cart(self, request):
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in SHOPPING_LIST_FORMATS:
+            return Response({
+                'errors': 'Неподдерживаемый формат списка покупок'
+            }, status=status.HTTP_400_BAD_REQUEST)
         if not ShoppingCart.objects.filter(user=self.request.user).exists():
             return Response({
                 'errors': 'Ваша корзина пуста'
             }, status=status.HTTP_400_BAD_REQUEST)
-        ingredient_list = IngredientRecipe.objects.filter(
-            recipe__in_shopping_list__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        print_list = ''
-        print_list += '\n'.join([
-            f'{i + 1}. {ingredient["ingredient__name"]} '
-            f'({ingredient["ingredient__measurement_unit"]})'
-            f' - {ingredient["amount"]}'
-            for i, ingredient in enumerate(ingredient_list)
-        ])
-        res = HttpResponse(print_list, content_type='text/plain')
+        content_type, extension = SHOPPING_LIST_FORMATS[export_format]
+        if export_format == 'pdf':
+            content = iter_bytes(get_pdf(request.user))
+        elif export_format == 'csv':
+            content = csv_lines(iter_ingredient_totals(request.user))
+        else:
+            content = txt_lines(iter_ingredient_totals(request.user))
+        res = StreamingHttpResponse(
+            count_export_bytes(content, export_format),
+            content_type=content_type
+        )
         res['Content-Disposition'] = (
-            'attachment; filename=your_shopping_list'
+            f'attachment; filename=your_shopping_list{extension}'
         )
         return res
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    CatalogueCacheMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientFilter,)
     search_fields = ('^name',)
+    catalogue_version_key = INGREDIENTS_VERSION_KEY
+
+    def list(self, request, *args, **kwargs):
+        if IngredientFilter.search_param not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(self.search, request)
+
+    def search(self, request):
+        return Response(ingredient_index.search(
+            request.query_params[IngredientFilter.search_param],
+            ranked=request.query_params.get('ranked') in ('1', 'true'),
+        ))
 
 
 class CustomDjoserUserViewSet(UserViewSet):
     queryset = User.objects.all()
     pagination_class = CustomUserPagionation
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            if self.request.user.is_anonymous:
+                return queryset.annotate(is_subscribed=Value(False))
+            return queryset.annotate(is_subscribed=Exists(
+                Subscribe.objects.filter(
+                    subscriber=self.request.user, author=OuterRef('pk')
+                )
+            ))
+        return queryset
+
     @action(
         detail=False,
         permission_classes=(IsAuthenticated,),
@@ -167,15 +311,35 @@ class CustomDjoserUserViewSet(UserViewSet):
     def subscriptions(self, request):
         return self.get_paginated_response(
             SubscribeSerializer(
-                self.paginate_queryset(
-                    User.objects.filter(
-                        following__subscriber=self.request.user
-                    )
-                ),
+                self.paginate_queryset(self.get_subscriptions_queryset()),
                 many=True,
                 context={'request': request}
             ).data)
 
+    def get_subscriptions_queryset(self):
+        return self.annotate_subscriptions(User.objects.filter(
+            following__subscriber=self.request.user
+        )).order_by('id')
+
+    def annotate_subscriptions(self, queryset):
+        query = SubscriptionsQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        recipes = Recipe.objects.all()
+        if 'recipes_limit' in query.validated_data:
+            recipes = recipes.annotate(
+                author_rank=Window(
+                    RowNumber(),
+                    partition_by=F('author'),
+                    order_by=(F('pub_date').desc(), F('id').desc()),
+                )
+            ).filter(author_rank__lte=query.validated_data['recipes_limit'])
+        return queryset.annotate(
+            is_subscribed=Value(True),
+            recipes_count=Coalesce(F('counters__recipes_count'), 0),
+        ).prefetch_related(
+            Prefetch('recipe_set', queryset=recipes, to_attr='limited_recipes')
+        )
+
     @action(
         detail=True,
         methods=('post', 'delete'),
@@ -183,37 +347,29 @@ class CustomDjoserUserViewSet(UserViewSet):
     )
     def subscribe(self, request, id):
         if self.request.method == 'POST':
-            if Subscribe.objects.filter(
-                subscriber=self.request.user,
-                author=get_object_or_404(User, pk=id)
-            ).exists():
+            author = get_object_or_404(
+                self.annotate_subscriptions(User.objects.all()), pk=id
+            )
+            if self.request.user == author:
                 return Response({
-                    'errors': 'Подписка уже существует'
+                    'errors': 'Не выйдет подписаться самого на себя'
                 }, status=status.HTTP_400_BAD_REQUEST)
-            if self.request.user == get_object_or_404(User, pk=id):
+            if not add_relation(
+                Subscribe, subscriber=self.request.user, author=author
+            ):
                 return Response({
-                    'errors': 'Не выйдет подписаться самого на себя'
+                    'errors': 'Подписка уже существует'
                 }, status=status.HTTP_400_BAD_REQUEST)
-            Subscribe.objects.create(
-                subscriber=self.request.user,
-                author=get_object_or_404(User, pk=id)
-            )
             return Response(SubscribeSerializer(
-                get_object_or_404(User, pk=id), context={'request': request}
+                author, context={'request': request}
             ).data,
                 status=status.HTTP_201_CREATED
             )
-        if self.request.method == 'DELETE':
-            if not Subscribe.objects.filter(
-                subscriber=self.request.user,
-                author=get_object_or_404(User, pk=id)
-            ).exists():
-                return Response({
-                    'errors': 'Подписка еще не оформлена'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            get_object_or_404(
-                Subscribe,
-                subscriber=self.request.user,
-                author=get_object_or_404(User, pk=id)
-            ).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        if not remove_relation(
+            Subscribe, subscriber=self.request.user, author_id=id
+        ):
+            get_object_or_404(User.objects.only('id'), pk=id)
+            return Response({
+                'errors': 'Подписка еще не оформлена'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
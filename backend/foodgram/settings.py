@@ -8,7 +8,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
 
-DEBUG = os.getenv('DEBUG', False)
+DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = ['127.0.0.1', 'localhost', '158.160.27.157']
 
@@ -25,11 +25,13 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'djoser',
     'sorl.thumbnail',
-    'debug_toolbar',
     'django_filters',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,9 +39,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -71,6 +76,28 @@ DATABASES = {
     }
 }
 
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -93,6 +120,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 DJOSER = {
@@ -128,7 +159,85 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 INTERNAL_IPS = ['172.22.0.1', ]
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+        },
+        'recipes': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # Constants
 PRE_LEN_TEXT: int = 15
 USER_PAG_PAGE_SIZE: int = 1
 RECIPE_PAG_PAGE_SIZE: int = 6
+RECIPE_IMAGE_MAX_SIZE: int = 5 * 1024 * 1024
+RECIPE_IMAGE_MAX_DIMENSION: int = 4096
+RECIPE_IMAGE_FORMATS: tuple = ('JPEG', 'PNG', 'WEBP')
+RECIPE_IMAGE_VARIANT_WIDTHS: tuple = (320, 640)
+RECIPE_IMAGE_LIST_VARIANT: str = '320.webp'
+RECIPE_IMAGE_WORKERS: int = 2
+RECIPE_BATCH_MAX_SIZE: int = 100
+RECIPE_SEARCH_CONFIG: str = 'russian'
+RECIPE_MATCH_MAX_INGREDIENTS: int = 100
+FEED_BATCH_SIZE: int = 2000
+USER_RELATIONS_MAX_SIZE: int = 5000
+CATALOGUE_CACHE_TIMEOUT: int = 60 * 60 * 24
+CACHE_VERSION_TTL: int = int(os.getenv('CACHE_VERSION_TTL', 5))
+SHOPPING_LIST_CHUNK_SIZE: int = 500
+SHOPPING_LIST_PDF_CACHE_TIMEOUT: int = 60 * 60
+SHOPPING_LIST_PDF_FONT: str = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+SERVER_TIMING_HEADER: bool = os.getenv(
+    'SERVER_TIMING_HEADER', 'True'
+) == 'True'
+PROFILING_SAMPLE_RATE: float = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR: str = os.getenv(
+    'PROFILING_DIR', os.path.join(BASE_DIR, 'profiles')
+)
+DATABASE_REPLICA_PIN_SECONDS: int = int(
+    os.getenv('DATABASE_REPLICA_PIN_SECONDS', 5)
+)
+ASYNC_READ_VIEWS: bool = os.getenv(
+    'ASYNC_READ_VIEWS', 'False'
+) == 'True'
+METRICS_TOKEN: str = os.getenv('METRICS_TOKEN', '')
+METRICS_LATENCY_BUCKETS: tuple = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+
+# Token-authenticated requests; the token lookup is one of the queries.
+QUERY_BUDGETS: dict = {
+    'TagViewSet.list': 1,
+    'TagViewSet.retrieve': 1,
+    'IngredientViewSet.list': 1,
+    'IngredientViewSet.retrieve': 1,
+    'RecipeViewSet.list': 6,
+    'RecipeViewSet.retrieve': 5,
+    'RecipeViewSet.download_shopping_cart': 3,
+    'RecipeViewSet.shopping_list': 2,
+    'RecipeViewSet.what_to_cook': 7,
+    'RecipeViewSet.feed': 6,
+    'CustomDjoserUserViewSet.list': 3,
+    'CustomDjoserUserViewSet.subscriptions': 4,
+}
+QUERY_BUDGETS_LOG_OVERRUNS: bool = os.getenv(
+    'QUERY_BUDGETS_LOG_OVERRUNS', 'False'
+) == 'True'
+
+if QUERY_BUDGETS_LOG_OVERRUNS:
+    MIDDLEWARE.append('api.middleware.QueryBudgetMiddleware')
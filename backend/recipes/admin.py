@@ -16,8 +16,9 @@ class IngridientAdmin(admin.ModelAdmin):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author')
+    list_display = ('name', 'author', 'favorites_count', 'in_carts_count')
     list_filter = ('author', 'name', 'tags',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
     inlines = (IngredientRecipeAdmin,)
 
 
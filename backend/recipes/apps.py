@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     verbose_name = 'Рецепты и ингридиенты'
     name = 'recipes'
+
+    def ready(self):
+        import recipes.signals  # noqa: F401
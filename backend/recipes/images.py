@@ -0,0 +1,79 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image
+
+from recipes.models import Recipe
+
+logger = logging.getLogger('recipes.images')
+
+VARIANT_FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+
+def variant_key(width, extension):
+    return f'{width}.{extension}'
+
+
+def needs_variants(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') != recipe.image.name
+    )
+
+
+def build_variants(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not needs_variants(recipe):
+        return
+    source = recipe.image.name
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    stem = os.path.splitext(os.path.basename(source))[0]
+    variants = {'source': source}
+    for width in settings.RECIPE_IMAGE_VARIANT_WIDTHS:
+        resized = image.copy()
+        resized.thumbnail((width, width * 4))
+        for extension, image_format in VARIANT_FORMATS:
+            if image_format == 'JPEG' and resized.mode != 'RGB':
+                frame = resized.convert('RGB')
+            else:
+                frame = resized
+            buffer = io.BytesIO()
+            frame.save(buffer, image_format, quality=80)
+            variants[variant_key(width, extension)] = default_storage.save(
+                f'recipes/variants/{recipe.pk}_{stem}_{width}.{extension}',
+                ContentFile(buffer.getvalue()),
+            )
+    updated = Recipe.objects.filter(pk=recipe.pk, image=source).update(
+        image_variants=variants
+    )
+    stale = recipe.image_variants if updated else variants
+    for key, name in stale.items():
+        if key != 'source':
+            default_storage.delete(name)
+
+
+def _run(recipe_id):
+    try:
+        build_variants(recipe_id)
+    except Exception:
+        logger.exception('Image variants failed for recipe %s', recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_variants(recipe_id):
+    transaction.on_commit(lambda: _executor.submit(_run, recipe_id))
@@ -0,0 +1,213 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import (
+    Favorite, Ingredient, IngredientRecipe, Recipe, ShoppingCart, Tag,
+    TagRecipe
+)
+from users.models import Subscribe, User
+
+TAG_COLORS = ('#E26C2D', '#49B64E', '#8775D2', '#F5A623', '#4A90E2')
+
+
+def zipf_weights(size, exponent):
+    return [1 / (rank ** exponent) for rank in range(1, size + 1)]
+
+
+def skewed_sample(population, weights, count):
+    count = min(count, len(population))
+    result = set()
+    while len(result) < count:
+        result.update(random.choices(
+            population, weights=weights, k=count - len(result)
+        ))
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, recipes and their relations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument(
+            '--favorites', type=int, default=30,
+            help='Average favorites per user'
+        )
+        parser.add_argument(
+            '--cart', type=int, default=5,
+            help='Average shopping cart size per user'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Average subscriptions per user'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Zipf exponent of author and recipe popularity'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def log(self, message):
+        self.stdout.write(
+            f'[{time.monotonic() - self.started:7.1f}s] {message}'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.started = time.monotonic()
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'Ingredients are empty, run load_ingredients first'
+            )
+        tag_ids = self.create_tags(options['tags'])
+        user_ids = self.create_users(options['users'])
+        author_weights = zipf_weights(len(user_ids), options['skew'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, author_weights,
+            tag_ids, ingredient_ids
+        )
+        recipe_weights = zipf_weights(len(recipe_ids), options['skew'])
+        self.create_relations(
+            Favorite, 'recipe_id', user_ids, recipe_ids, recipe_weights,
+            options['favorites']
+        )
+        self.create_relations(
+            ShoppingCart, 'recipe_id', user_ids, recipe_ids, recipe_weights,
+            options['cart']
+        )
+        self.create_subscriptions(
+            user_ids, author_weights, options['subscriptions']
+        )
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Done in {time.monotonic() - self.started:.1f}s'
+        ))
+
+    def create_tags(self, count):
+        prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        tags = Tag.objects.bulk_create(
+            Tag(
+                name=f'Тэг {i}', color=TAG_COLORS[i % len(TAG_COLORS)],
+                slug=f'{prefix}-{i}'
+            )
+            for i in range(count)
+        )
+        self.log(f'Tags: {len(tags)}')
+        return [tag.id for tag in tags]
+
+    def create_users(self, count):
+        prefix = f'bench{uuid.uuid4().hex[:8]}'
+        password = make_password('benchmark-password')
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=f'{prefix}_{i}',
+                    email=f'{prefix}_{i}@example.com',
+                    first_name='Имя', last_name='Фамилия',
+                    password=password,
+                )
+                for i in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        user_ids = [user.id for user in users]
+        random.shuffle(user_ids)
+        self.log(f'Users: {len(user_ids)}')
+        return user_ids
+
+    def create_recipes(self, count, user_ids, author_weights, tag_ids,
+                       ingredient_ids):
+        authors = random.choices(user_ids, weights=author_weights, k=count)
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=author_id,
+                    name=f'Рецепт {i}',
+                    text='Описание рецепта ' * random.randint(5, 50),
+                    cooking_time=random.randint(5, 180),
+                    image='recipes/benchmark.png',
+                )
+                for i, author_id in enumerate(authors)
+            ),
+            batch_size=self.batch_size,
+        )
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                minutes=random.randint(0, 60 * 24 * 365)
+            )
+        Recipe.objects.bulk_update(
+            recipes, ('pub_date',), batch_size=self.batch_size
+        )
+        self.log(f'Recipes: {len(recipes)}')
+        TagRecipe.objects.bulk_create(
+            (
+                TagRecipe(recipe_id=recipe.id, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in random.sample(
+                    tag_ids, min(len(tag_ids), random.randint(1, 3))
+                )
+            ),
+            batch_size=self.batch_size,
+        )
+        IngredientRecipe.objects.bulk_create(
+            (
+                IngredientRecipe(
+                    recipe_id=recipe.id, ingredient_id=ingredient_id,
+                    amount=random.randint(1, 500)
+                )
+                for recipe in recipes
+                for ingredient_id in random.sample(
+                    ingredient_ids,
+                    min(len(ingredient_ids), random.randint(3, 12))
+                )
+            ),
+            batch_size=self.batch_size,
+        )
+        self.log('Recipe tags and ingredients')
+        return [recipe.id for recipe in recipes]
+
+    def create_relations(self, model, field, user_ids, target_ids, weights,
+                         average):
+        objects = (
+            model(user_id=user_id, **{field: target_id})
+            for user_id in user_ids
+            for target_id in skewed_sample(
+                target_ids, weights,
+                int(random.expovariate(1 / average)) if average else 0
+            )
+        )
+        model.objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        self.log(f'{model.__name__}: {model.objects.count()}')
+
+    def create_subscriptions(self, user_ids, author_weights, average):
+        objects = (
+            Subscribe(subscriber_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in skewed_sample(
+                user_ids, author_weights,
+                int(random.expovariate(1 / average)) if average else 0
+            )
+            if author_id != user_id
+        )
+        Subscribe.objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        self.log(f'Subscriptions: {Subscribe.objects.count()}')
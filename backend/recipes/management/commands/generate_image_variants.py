@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_variants, needs_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnail and WebP variants of recipe images'
+
+    def handle(self, *args, **options):
+        built = 0
+        for recipe in Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_variants'
+        ).iterator():
+            if needs_variants(recipe):
+                build_variants(recipe.pk)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f'Variants built: {built}'))
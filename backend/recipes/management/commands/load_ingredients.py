@@ -1,22 +1,133 @@
 import csv
+import json
+import os
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from api.ingredient_index import invalidate_ingredient_index
 from recipes.models import Ingredient
 
+READ_CHUNK_SIZE = 64 * 1024
+FIELDS = ('name', 'measurement_unit')
+
+
+def iter_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < 2:
+            raise CommandError(
+                f'Row {reader.line_num}: expected name and measurement unit'
+            )
+        yield reader.line_num, row[0], row[1]
+
+
+def iter_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    number = 0
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise CommandError('JSON file must contain a list')
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer[:1] in (',', ']'):
+                buffer = buffer[1:]
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break
+            buffer = buffer[end:]
+            number += 1
+            if not isinstance(item, dict) or not all(
+                isinstance(item.get(field), str) for field in FIELDS
+            ):
+                raise CommandError(
+                    f'Row {number}: expected an object with string '
+                    'name and measurement_unit'
+                )
+            yield number, item['name'], item['measurement_unit']
+        if not chunk:
+            if buffer.strip():
+                raise CommandError('Malformed JSON file')
+            return
+
+
+def clean_row(number, name, measurement_unit):
+    key = (name.strip(), measurement_unit.strip())
+    for field, value in zip(FIELDS, key):
+        max_length = Ingredient._meta.get_field(field).max_length
+        if not value or len(value) > max_length:
+            raise CommandError(
+                f'Row {number}: {field} must be 1 to {max_length} characters'
+            )
+    return key
+
 
 class Command(BaseCommand):
-    help = 'Import CSV data into IngridientsModel'
+    help = 'Import CSV or JSON data into IngridientsModel'
 
     def add_arguments(self, parser):
-        parser.add_argument('csv_file', type=str, help='The path to the file')
+        parser.add_argument('path', type=str, help='The path to the file')
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='File format, detected by extension by default'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows per bulk insert'
+        )
 
     def handle(self, *args, **options):
-        csv_file = options['csv_file']
-        with open(csv_file, 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                _, created = Ingredient.objects.get_or_create(
-                    name=row[0],
-                    measurement_unit=row[1],
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.')
+        ).lower()
+        if file_format not in ('csv', 'json'):
+            raise CommandError(f'Unsupported file format: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        reader = iter_csv if file_format == 'csv' else iter_json
+        started = time.monotonic()
+        count_before = Ingredient.objects.count()
+        seen = set()
+        batch = []
+        total = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for number, name, measurement_unit in reader(f):
+                total += 1
+                key = clean_row(number, name, measurement_unit)
+                if key in seen:
+                    continue
+                seen.add(key)
+                batch.append(
+                    Ingredient(name=key[0], measurement_unit=key[1])
                 )
+                if len(batch) >= options['batch_size']:
+                    Ingredient.objects.bulk_create(
+                        batch, ignore_conflicts=True
+                    )
+                    batch = []
+        if batch:
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        inserted = Ingredient.objects.count() - count_before
+        if inserted:
+            invalidate_ingredient_index()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rows read: {total}, inserted: {inserted}, '
+            f'skipped: {total - inserted}, '
+            f'{total / elapsed if elapsed else total:.0f} rows/s'
+        ))
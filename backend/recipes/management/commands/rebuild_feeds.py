@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild subscription feeds from subscriptions and recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Rebuild only the feed of this user id, may be repeated'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        entries = FeedEntry.objects.all()
+        filters = {}
+        if options['users']:
+            entries = entries.filter(user__in=options['users'])
+            filters['subscriber__in'] = options['users']
+        entries.delete()
+        created = FeedEntry.fill(**filters)
+        self.stdout.write(f'FeedEntry: {len(created)} rows rebuilt')
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import (
+    Favorite, IngredientRecipe, Recipe, ShoppingCart, ShoppingListItem
+)
+from users.models import Subscribe, User, UserCounters
+
+
+def count_subquery(model, field, outer_field='pk'):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef(outer_field)}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculate denormalized recipe and user counters, fill missing '
+        'recipe search vectors and rebuild shopping lists'
+    )
+
+    def repair(self, queryset, field, actual):
+        fixed = queryset.filter(~Q(**{field: actual})).update(
+            **{field: actual}
+        )
+        self.stdout.write(
+            f'{queryset.model.__name__}.{field}: {fixed} rows repaired'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        UserCounters.objects.bulk_create(
+            (
+                UserCounters(user_id=user_id)
+                for user_id in User.objects.filter(
+                    counters__isnull=True
+                ).values_list('id', flat=True)
+            ),
+            ignore_conflicts=True
+        )
+        self.repair(
+            Recipe.objects.all(), 'favorites_count',
+            count_subquery(Favorite, 'recipe')
+        )
+        self.repair(
+            Recipe.objects.all(), 'in_carts_count',
+            count_subquery(ShoppingCart, 'recipe')
+        )
+        self.repair(
+            Recipe.objects.all(), 'ingredients_count',
+            count_subquery(IngredientRecipe, 'recipe')
+        )
+        self.repair(
+            UserCounters.objects.all(), 'recipes_count',
+            count_subquery(Recipe, 'author', 'user')
+        )
+        self.repair(
+            UserCounters.objects.all(), 'followers_count',
+            count_subquery(Subscribe, 'author', 'user')
+        )
+        filled = Recipe.refresh_search_vector(
+            Recipe.objects.filter(search_vector__isnull=True).values('pk')
+        )
+        self.stdout.write(f'Recipe.search_vector: {filled} rows filled')
+        ShoppingListItem.objects.all().delete()
+        items = ShoppingListItem.objects.bulk_create(
+            ShoppingListItem.from_carts(
+                recipe__in_shopping_list__isnull=False
+            ),
+            batch_size=2000,
+        )
+        self.stdout.write(f'ShoppingListItem: {len(items)} rows rebuilt')
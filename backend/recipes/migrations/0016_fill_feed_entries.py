@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def fill_feed_entries(apps, schema_editor):
+    Subscribe = apps.get_model('users', 'Subscribe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    rows = Subscribe.objects.filter(author__recipe__isnull=False).values_list(
+        'subscriber_id', 'author__recipe', 'author__recipe__pub_date'
+    ).order_by()
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for user_id, recipe_id, pub_date in rows.iterator()
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_feed_entries'),
+        ('users', '0005_user_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_feed_entries, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connection, models, transaction
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db.models import UniqueConstraint
+from django.dispatch import Signal
+from django.db.models import (
+    Exists, F, OuterRef, Prefetch, Sum, UniqueConstraint, Value
+)
 
-from users.models import User
+from users.models import User, Subscribe
 from django.conf import settings
 
 
@@ -15,6 +19,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='Ingredient-unit Unique'
+            )
+        ]
 
     def __str__(self):
         return str(self.name[:settings.PRE_LEN_TEXT])
@@ -37,6 +47,45 @@ class Tag(models.Model):
         return str(self.name[:settings.PRE_LEN_TEXT])
 
 
+def annotate_is_subscribed(authors, user):
+    if user.is_anonymous:
+        return authors.annotate(is_subscribed=Value(False))
+    return authors.annotate(is_subscribed=Exists(Subscribe.objects.filter(
+        subscriber=user, author=OuterRef('pk')
+    )))
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def for_read(self, user):
+        """Recipes with everything RecipeSafeMethodSerializer reads."""
+        if user.is_anonymous:
+            queryset = self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        else:
+            queryset = self.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+            )
+        return queryset.defer('search_vector').prefetch_related(
+            'tags',
+            Prefetch(
+                'author',
+                queryset=annotate_is_subscribed(User.objects.all(), user)
+            ),
+            Prefetch(
+                'ingredientrecipe_set',
+                queryset=IngredientRecipe.objects.select_related('ingredient')
+            ),
+        )
+
+
 class Recipe(models.Model):
     tags = models.ManyToManyField(
         Tag, through='TagRecipe',
@@ -55,6 +104,10 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes/', blank=True, verbose_name='Изображение'
     )
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False,
+        verbose_name='Уменьшенные копии изображения'
+    )
     text = models.TextField(verbose_name='Описание рецепта')
     cooking_time = models.PositiveSmallIntegerField(
         validators=(MinValueValidator(1),), verbose_name='Время приготовления'
@@ -62,15 +115,58 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name='Дата публикации'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В корзинах'
+    )
+    ingredients_count = models.PositiveSmallIntegerField(
+        default=0, editable=False, verbose_name='Число ингредиентов'
+    )
+    search_vector = SearchVectorField(
+        null=True, editable=False, verbose_name='Поисковый вектор'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return str(self.name[:settings.PRE_LEN_TEXT])
 
+    @classmethod
+    def change_counter(cls, recipe_ids, field, delta):
+        queryset = cls.objects.filter(pk__in=recipe_ids)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        return queryset.update(**{field: F(field) + delta})
+
+    @classmethod
+    def refresh_search_vector(cls, recipe_ids):
+        """Recompute search_vector; it is only maintained on PostgreSQL."""
+        if connection.vendor != 'postgresql':
+            return 0
+        config = settings.RECIPE_SEARCH_CONFIG
+        return cls.objects.filter(pk__in=recipe_ids).update(
+            search_vector=(
+                SearchVector('name', weight='A', config=config)
+                + SearchVector('text', weight='B', config=config)
+            )
+        )
+
 
 class TagRecipe(models.Model):
     tag = models.ForeignKey(
@@ -84,6 +180,11 @@ class TagRecipe(models.Model):
     class Meta:
         verbose_name = 'Тэг'
         verbose_name_plural = 'Тэги'
+        indexes = [
+            models.Index(
+                fields=('tag', 'recipe'), name='tagrecipe_tag_recipe_idx'
+            ),
+        ]
 
 
 class IngredientRecipe(models.Model):
@@ -148,3 +249,118 @@ class ShoppingCart(models.Model):
                 name='User-recipe shopping list Unique'
             )
         ]
+
+
+# Sent with the ids of users whose shopping list items were recomputed.
+shopping_list_changed = Signal()
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        verbose_name='Пользователь', related_name='shopping_list_items'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='User-ingredient shopping list item Unique'
+            )
+        ]
+
+    @classmethod
+    def from_carts(cls, **filters):
+        totals = IngredientRecipe.objects.filter(**filters).values(
+            'recipe__in_shopping_list__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+        for row in totals.iterator():
+            yield cls(
+                user_id=row['recipe__in_shopping_list__user'],
+                ingredient_id=row['ingredient'],
+                amount=row['total'],
+            )
+
+    @classmethod
+    def refresh(cls, user_ids, ingredient_ids):
+        """Recompute the list items of users from their carts.
+
+        The users are locked first, so concurrent refreshes of one list
+        run one after another and each sums the carts committed before
+        it instead of racing on the user-ingredient constraint.
+        """
+        with transaction.atomic():
+            user_ids = list(User.objects.select_for_update().filter(
+                pk__in=user_ids
+            ).order_by('pk').values_list('pk', flat=True))
+            if not user_ids:
+                return
+            cls.objects.filter(
+                user__in=user_ids, ingredient__in=ingredient_ids
+            ).delete()
+            cls.objects.bulk_create(
+                cls.from_carts(
+                    recipe__in_shopping_list__user__in=user_ids,
+                    ingredient__in=ingredient_ids,
+                ),
+                update_conflicts=True,
+                unique_fields=('user', 'ingredient'),
+                update_fields=('amount',),
+            )
+            shopping_list_changed.send(sender=cls, user_ids=user_ids)
+
+
+class FeedEntry(models.Model):
+    """Recipe of a followed author, copied into the subscriber's feed."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        verbose_name='Подписчик', related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        verbose_name='Рецепт', related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='User-recipe feed entry Unique'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feedentry_user_pub_date_idx'
+            ),
+        ]
+
+    @classmethod
+    def from_subscriptions(cls, **filters):
+        rows = Subscribe.objects.filter(
+            author__recipe__isnull=False, **filters
+        ).values_list(
+            'subscriber_id', 'author__recipe', 'author__recipe__pub_date'
+        ).order_by()
+        for user_id, recipe_id, pub_date in rows.iterator(
+            chunk_size=settings.FEED_BATCH_SIZE
+        ):
+            yield cls(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+
+    @classmethod
+    def fill(cls, **filters):
+        return cls.objects.bulk_create(
+            cls.from_subscriptions(**filters),
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
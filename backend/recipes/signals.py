@@ -0,0 +1,159 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.images import needs_variants, schedule_variants
+from recipes.models import (
+    FeedEntry, Favorite, IngredientRecipe, Recipe, ShoppingCart,
+    ShoppingListItem
+)
+from users.models import Subscribe, User, UserCounters
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+RECIPE_SEARCH_FIELDS = {'name', 'text'}
+
+batched_senders = ContextVar('batched_senders', default=frozenset())
+
+
+@contextmanager
+def batched(*senders):
+    """Skip the per-row receivers of senders inside the block.
+
+    For bulk changes made through the public QuerySet API whose caller
+    applies the effects of those receivers once for the whole batch.
+    """
+    token = batched_senders.set(batched_senders.get() | set(senders))
+    try:
+        yield
+    finally:
+        batched_senders.reset(token)
+
+
+def is_batched(sender, origin=None, cascades_from=()):
+    """Whether a per-row receiver should leave the change to others.
+
+    Either the caller opened batched() for the sender, or the row is
+    deleted in a cascade from one of cascades_from, whose own receivers
+    cover it.
+    """
+    if sender in batched_senders.get():
+        return True
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(
+        origin
+    )
+    return issubclass(origin_model, cascades_from)
+
+
+def refresh_cart_recipes(user_id, recipe_ids):
+    ShoppingListItem.refresh(
+        (user_id,),
+        IngredientRecipe.objects.filter(
+            recipe__in=recipe_ids
+        ).values('ingredient_id'),
+    )
+
+
+def refresh_recipe_carts(recipe_id, ingredient_ids):
+    ShoppingListItem.refresh(
+        ShoppingCart.objects.filter(recipe=recipe_id).values('user_id'),
+        ingredient_ids,
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def recipe_relation_created(sender, instance, created, **kwargs):
+    if created and not is_batched(sender):
+        Recipe.change_counter(
+            (instance.recipe_id,), RECIPE_COUNTERS[sender], 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_relation_deleted(sender, instance, origin=None, **kwargs):
+    if is_batched(sender, origin, cascades_from=Recipe):
+        return
+    Recipe.change_counter((instance.recipe_id,), RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if created and not is_batched(sender):
+        refresh_cart_recipes(instance.user_id, (instance.recipe_id,))
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, origin=None, **kwargs):
+    if is_batched(sender, origin, cascades_from=(Recipe, User)):
+        return
+    refresh_cart_recipes(instance.user_id, (instance.recipe_id,))
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, origin=None, **kwargs):
+    if is_batched(sender, origin, cascades_from=(Recipe, User)):
+        return
+    refresh_recipe_carts(instance.recipe_id, (instance.ingredient_id,))
+
+
+@receiver(post_save, sender=IngredientRecipe)
+def recipe_ingredient_created(sender, instance, created, **kwargs):
+    if created and not is_batched(sender):
+        Recipe.change_counter((instance.recipe_id,), 'ingredients_count', 1)
+
+
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredient_deleted(sender, instance, origin=None, **kwargs):
+    if is_batched(sender, origin, cascades_from=(Recipe, User)):
+        return
+    Recipe.change_counter((instance.recipe_id,), 'ingredients_count', -1)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    instance.cart_user_ids = list(ShoppingCart.objects.filter(
+        recipe=instance
+    ).values_list('user_id', flat=True))
+    instance.ingredient_ids = list(IngredientRecipe.objects.filter(
+        recipe=instance
+    ).values_list('ingredient_id', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        UserCounters.change_counter((instance.author_id,), 'recipes_count', 1)
+        FeedEntry.fill(author=instance.author_id, author__recipe=instance.pk)
+    if update_fields is None or RECIPE_SEARCH_FIELDS & update_fields:
+        Recipe.refresh_search_vector((instance.pk,))
+    if needs_variants(instance):
+        schedule_variants(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    UserCounters.change_counter((instance.author_id,), 'recipes_count', -1)
+    if getattr(instance, 'cart_user_ids', None):
+        ShoppingListItem.refresh(
+            instance.cart_user_ids, instance.ingredient_ids
+        )
+
+
+@receiver(post_save, sender=Subscribe)
+def subscribe_created(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.fill(pk=instance.pk)
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscribe_deleted(sender, instance, **kwargs):
+    FeedEntry.objects.filter(
+        user=instance.subscriber_id, recipe__author=instance.author_id
+    ).delete()
@@ -6,7 +6,19 @@ from .models import User
 
 
 class MyUserAdmin(UserAdmin):
+    list_display = UserAdmin.list_display + (
+        'recipes_count', 'followers_count'
+    )
     list_filter = ('email', 'username')
+    list_select_related = ('counters',)
+
+    @admin.display(description='Рецептов')
+    def recipes_count(self, obj):
+        return obj.counters.recipes_count
+
+    @admin.display(description='Подписчиков')
+    def followers_count(self, obj):
+        return obj.counters.followers_count
 
 
 admin.site.unregister(Group)
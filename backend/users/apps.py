@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     verbose_name = 'Пользователи'
     name = 'users'
+
+    def ready(self):
+        import users.signals  # noqa: F401
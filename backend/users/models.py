@@ -32,3 +32,43 @@ class Subscribe(models.Model):
 
     def __str__(self):
         return f'Пользователь {self.subscriber} подписался на {self.author}'
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        verbose_name='Пользователь', related_name='counters'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0, verbose_name='Рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписчиков'
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+    def __str__(self):
+        return f'Счетчики пользователя {self.user_id}'
+
+    @classmethod
+    def change_counter(cls, user_ids, field, delta):
+        user_ids = set(user_ids)
+        queryset = cls.objects.filter(user_id__in=user_ids)
+        if delta < 0:
+            return queryset.filter(**{f'{field}__gte': -delta}).update(
+                **{field: F(field) + delta}
+            )
+        updated = queryset.update(**{field: F(field) + delta})
+        if updated < len(user_ids):
+            existing = set(queryset.values_list('user_id', flat=True))
+            cls.objects.bulk_create(
+                (
+                    cls(user_id=user_id, **{field: delta})
+                    for user_id in user_ids - existing
+                ),
+                ignore_conflicts=True
+            )
+        return len(user_ids)